@@ -0,0 +1,194 @@
+import argparse
+import os
+import time
+import numpy as np
+from gallery import normalize
+
+
+class IVFIndex:
+    """Inverted-file (IVF-flat) approximate nearest-neighbour index.
+
+    Vectors are clustered around `nlist` spherical k-means centroids and each
+    query only scans the `nprobe` closest lists. Raising `nprobe` trades
+    latency for recall; `nprobe == nlist` is an exact search. Inserts and
+    deletes are incremental, so the index never needs a full rebuild after
+    registering or removing a user.
+    """
+
+    def __init__(self, nlist=0, nprobe=8, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids = None
+        self.lists = []
+        self.list_ids = []
+        self._where = {}
+
+    def __len__(self):
+        return len(self._where)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def train(self, vectors, iterations=15, max_samples=256):
+        """Fits the coarse centroids with spherical k-means on (a sample of) vectors."""
+        vectors = normalize(vectors)
+        rng = np.random.default_rng(self.seed)
+        nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        if len(vectors) > nlist * max_samples:
+            vectors = vectors[rng.choice(len(vectors), nlist * max_samples, replace=False)]
+
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            counts = np.bincount(assignment, minlength=nlist)
+            empty = counts == 0
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            centroids = normalize(sums)
+
+        self.nlist = nlist
+        self.centroids = centroids
+        self.lists = [np.empty((0, centroids.shape[1]), dtype=np.float32) for _ in range(nlist)]
+        self.list_ids = [np.empty(0, dtype=object) for _ in range(nlist)]
+        self._where = {}
+        return self
+
+    def add(self, user, vector):
+        """Inserts or replaces a single user's vector."""
+        self.add_many([user], np.atleast_2d(vector))
+
+    def add_many(self, users, vectors):
+        """Inserts or replaces several users' vectors at once."""
+        vectors = normalize(np.atleast_2d(vectors))
+        for user in users:
+            self.remove(user)
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        for list_no in np.unique(assignment):
+            rows = np.flatnonzero(assignment == list_no)
+            ids = np.empty(len(rows), dtype=object)
+            ids[:] = [users[i] for i in rows]
+            self.lists[list_no] = np.vstack([self.lists[list_no], vectors[rows]])
+            self.list_ids[list_no] = np.concatenate([self.list_ids[list_no], ids])
+            for user in ids:
+                self._where[user] = list_no
+
+    def remove(self, user):
+        """Deletes a user from the index; unknown users are ignored."""
+        list_no = self._where.pop(user, None)
+        if list_no is None:
+            return
+        keep = self.list_ids[list_no] != user
+        self.lists[list_no] = self.lists[list_no][keep]
+        self.list_ids[list_no] = self.list_ids[list_no][keep]
+
+    def search(self, probes, k=1, nprobe=None):
+        """Returns (ids, scores) lists of the k best candidates for each probe."""
+        probes = normalize(np.atleast_2d(probes))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        coarse = probes @ self.centroids.T
+        probe_lists = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        all_ids, all_scores = [], []
+        for probe, lists in zip(probes, probe_lists):
+            vectors = np.vstack([self.lists[i] for i in lists])
+            ids = np.concatenate([self.list_ids[i] for i in lists])
+            scores = vectors @ probe
+            top = np.argsort(-scores)[:k]
+            all_ids.append(ids[top])
+            all_scores.append(scores[top])
+        return all_ids, all_scores
+
+    def save(self, path):
+        """Serializes the index to a single .npz file, replacing it atomically."""
+        sizes = np.array([len(ids) for ids in self.list_ids], dtype=np.int64)
+        dim = self.centroids.shape[1]
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                nprobe=self.nprobe,
+                sizes=sizes,
+                vectors=np.vstack(self.lists) if sizes.sum() else np.empty((0, dim), dtype=np.float32),
+                ids=np.array([str(user) for ids in self.list_ids for user in ids], dtype=str),
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Restores an index written by save()."""
+        with np.load(path) as data:
+            index = cls(nlist=len(data["centroids"]), nprobe=int(data["nprobe"]))
+            index.centroids = data["centroids"]
+            offsets = np.concatenate([[0], np.cumsum(data["sizes"])])
+            vectors, ids = data["vectors"], data["ids"].astype(object)
+        for list_no in range(index.nlist):
+            start, end = offsets[list_no], offsets[list_no + 1]
+            index.lists.append(vectors[start:end])
+            index.list_ids.append(ids[start:end])
+            for user in ids[start:end]:
+                index._where[user] = list_no
+        return index
+
+    def sync(self, user_ids, matrix):
+        """Brings the index in line with the gallery after a crash or offline edits."""
+        wanted = set(user_ids)
+        for user in set(self._where) - wanted:
+            self.remove(user)
+        missing = [i for i, user in enumerate(user_ids) if user not in self._where]
+        if missing:
+            self.add_many([user_ids[i] for i in missing], matrix[missing])
+
+    def recall(self, probes, matrix, user_ids, k=10, nprobe=None):
+        """Measures recall@k and mean query latency against an exact search."""
+        probes = normalize(np.atleast_2d(probes))
+        exact = np.argsort(-(probes @ matrix.T), axis=1)[:, :k]
+        start = time.perf_counter()
+        approx_ids, _ = self.search(probes, k=k, nprobe=nprobe)
+        latency = (time.perf_counter() - start) / len(probes)
+        hits = sum(
+            len(set(user_ids[row]) & set(found))
+            for row, found in zip(exact, approx_ids)
+        )
+        return hits / (len(probes) * k), latency
+
+
+def main():
+    """Prints the recall/latency tradeoff of the index for several nprobe values."""
+    parser = argparse.ArgumentParser(description="Check IVF recall against exact search.")
+    parser.add_argument("--base-folder", default=None, help="FaceRecords folder; synthetic data if omitted")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=1)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.base_folder:
+        from gallery import EmbeddingGallery
+        matrix, user_ids, _ = EmbeddingGallery(args.base_folder).load().snapshot()
+    else:
+        matrix = normalize(rng.normal(size=(args.size, args.dim)))
+        user_ids = np.array([f"user_{i}" for i in range(args.size)], dtype=object)
+
+    index = IVFIndex().train(matrix)
+    index.add_many(list(user_ids), matrix)
+    probes = matrix[rng.choice(len(matrix), args.queries)] + rng.normal(scale=0.05, size=(args.queries, matrix.shape[1]))
+
+    exact_start = time.perf_counter()
+    for probe in normalize(probes):
+        np.argmax(matrix @ probe)
+    exact_latency = (time.perf_counter() - exact_start) / args.queries
+    print(f"nlist={index.nlist} exact: {exact_latency * 1000:.3f} ms/query")
+    for nprobe in args.nprobe:
+        recall, latency = index.recall(probes, matrix, user_ids, k=args.k, nprobe=nprobe)
+        print(f"nprobe={nprobe:4d} recall@{args.k}={recall:.3f} latency={latency * 1000:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,13 @@ import os
 import cv2
 import json
 from datetime import datetime
-from deepface import DeepFace
-from scipy.spatial.distance import cosine
 import uvicorn
+import config
+from embedding_store import open_store
+from gallery import EmbeddingGallery
+from instrumentation import instrument, stage
+from matcher import best_match, recognize_faces
+from model_pool import model_pool
 
 
 app = FastAPI()
@@ -26,9 +30,24 @@ app.add_middleware(
 )
 
 # Base folder for face data
-BASE_FOLDER = "FaceRecords"
+BASE_FOLDER = config.BASE_FOLDER
 os.makedirs(BASE_FOLDER, exist_ok=True)
 
+# Process-wide gallery, loaded once at startup and updated on registration
+gallery = EmbeddingGallery(
+    BASE_FOLDER, store=open_store(config.EMBEDDING_STORE, BASE_FOLDER), quantize=config.GALLERY_QUANTIZE
+)
+
+# Request latency histograms, gallery/model gauges and /metrics
+instrument(app, gallery_size=lambda: len(gallery), model_ready=lambda: model_pool.ready)
+
+
+@app.on_event("startup")
+def load_gallery():
+    model_pool.start_warm_up()
+    with stage("gallery_load"):
+        gallery.load()
+
 
 # Helper Functions
 def create_folder(folder_name: str):
@@ -37,51 +56,48 @@ def create_folder(folder_name: str):
         os.makedirs(folder_name)
 
 
-def make_serializable(obj):
-    """Converts non-serializable objects to serializable forms."""
-    if isinstance(obj, list):
-        return [make_serializable(i) for i in obj]
-    elif isinstance(obj, dict):
-        return {k: make_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, (float, int, str)):
-        return obj
-    return obj
-
-
-def save_face_embedding(photo_path: str, embedding_file: str):
-    """Extracts and saves face embedding."""
+def save_face_embedding(photo_paths: list, user: str, details: dict):
+    """Embeds every captured sample and saves them to the gallery and embedding store."""
     try:
-        embedding = DeepFace.represent(img_path=photo_path, enforce_detection=False)
-        with open(embedding_file, "w") as f:
-            json.dump(make_serializable(embedding), f, indent=4)
-        return embedding
+        representations = [model_pool.represent(photo_path) for photo_path in photo_paths]
+        embeddings = [faces[0]["embedding"] for faces in representations if faces]
+        if not embeddings:
+            raise HTTPException(status_code=400, detail="No face found in the captured images.")
+        gallery.add(user, embeddings, details)
+        return representations
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving embedding: {str(e)}")
 
 
-def compare_embeddings(live_embedding, stored_embeddings, threshold=0.4):
-    """Compares live embedding with stored embeddings."""
-    for user, data in stored_embeddings.items():
-        stored_embedding = data["embedding"][0]["embedding"]
-        similarity = 1 - cosine(live_embedding, stored_embedding)
-        if similarity > (1 - threshold):
-            return user, similarity, data["details"]
+@stage("match")
+def compare_embeddings(live_embedding, gallery, threshold=0.4):
+    """Returns the best gallery match for the live embedding."""
+    match = best_match(live_embedding, gallery, threshold=threshold)
+    if match:
+        return match
     return None, None, None
 
 
-def load_embeddings(base_folder=BASE_FOLDER):
-    """Loads all stored embeddings and user data."""
-    embeddings = {}
-    for user_folder in os.listdir(base_folder):
-        embedding_file = os.path.join(base_folder, user_folder, "embedding.json")
-        details_file = os.path.join(base_folder, user_folder, "details.json")
-        if os.path.exists(embedding_file) and os.path.exists(details_file):
-            with open(embedding_file, "r") as ef, open(details_file, "r") as df:
-                embeddings[user_folder] = {
-                    "embedding": json.load(ef),
-                    "details": json.load(df),
-                }
-    return embeddings
+def capture_frame(window: str):
+    """Shows the webcam until Space is pressed and returns that frame."""
+    camera = cv2.VideoCapture(0)
+    print("Press 'Space' to capture the face for recognition.")
+    try:
+        while True:
+            ret, frame = camera.read()
+            if not ret:
+                raise HTTPException(status_code=500, detail="Failed to capture frame.")
+            cv2.imshow(window, frame)
+            key = cv2.waitKey(1) & 0xFF
+            if key == 32:  # Space key
+                return frame
+            elif key == 27:  # Escape key
+                raise HTTPException(status_code=400, detail="Recognition cancelled.")
+    finally:
+        camera.release()
+        cv2.destroyAllWindows()
 
 
 # Models
@@ -92,9 +108,19 @@ class UserRegistration(BaseModel):
 
 
 # Endpoints
+@app.get("/ready")
+def readiness():
+    """Reports ready only once the recognition model has been warmed up."""
+    if not model_pool.ready:
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    return {"status": "ready"}
+
+
 @app.post("/register/")
-def register_user(name: str = Form(...), age: int = Form(...), gender: str = Form(...)):
-    """Registers a user by capturing their photo and saving details."""
+def register_user(
+    name: str = Form(...), age: int = Form(...), gender: str = Form(...), samples: int = Form(3)
+):
+    """Registers a user by capturing several photos and saving details."""
     user_folder = os.path.join(BASE_FOLDER, name)
     create_folder(user_folder)
 
@@ -104,12 +130,13 @@ def register_user(name: str = Form(...), age: int = Form(...), gender: str = For
     with open(details_file, "w") as f:
         json.dump(user_details, f, indent=4)
 
-    # Capture photo
+    # Capture one photo per sample; a few angles and expressions make matching more reliable
+    samples = max(1, min(samples, config.ENROLL_MAX_SAMPLES))
     camera = cv2.VideoCapture(0)
-    print("Press 'Space' to capture the photo.")
-    photo_path = None
+    print(f"Press 'Space' to capture each of {samples} photos, 'Enter' to finish early.")
+    photo_paths = []
     try:
-        while True:
+        while len(photo_paths) < samples:
             ret, frame = camera.read()
             if not ret:
                 raise HTTPException(status_code=500, detail="Failed to capture image.")
@@ -117,8 +144,10 @@ def register_user(name: str = Form(...), age: int = Form(...), gender: str = For
             key = cv2.waitKey(1) & 0xFF
             if key == 32:  # Space key
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                photo_path = os.path.join(user_folder, f"{name}_{timestamp}.jpg")
+                photo_path = os.path.join(user_folder, f"{name}_{timestamp}_{len(photo_paths)}.jpg")
                 cv2.imwrite(photo_path, frame)
+                photo_paths.append(photo_path)
+            elif key == 13 and photo_paths:  # Enter key
                 break
             elif key == 27:  # Escape key
                 raise HTTPException(status_code=400, detail="Photo capture cancelled.")
@@ -127,8 +156,7 @@ def register_user(name: str = Form(...), age: int = Form(...), gender: str = For
         cv2.destroyAllWindows()
 
     # Save face embedding
-    embedding_file = os.path.join(user_folder, "embedding.json")
-    save_face_embedding(photo_path, embedding_file)
+    save_face_embedding(photo_paths, name, user_details)
 
     return {"message": "User registered successfully.", "details": user_details}
 
@@ -136,33 +164,14 @@ def register_user(name: str = Form(...), age: int = Form(...), gender: str = For
 @app.post("/recognize/")
 def recognize_face():
     """Recognizes a face from the webcam."""
-    embeddings = load_embeddings()
-    if not embeddings:
+    if not len(gallery):
         raise HTTPException(status_code=400, detail="No registered users found.")
 
-    # Capture a frame
-    camera = cv2.VideoCapture(0)
-    print("Press 'Space' to capture the face for recognition.")
-    live_embedding = None
-    try:
-        while True:
-            ret, frame = camera.read()
-            if not ret:
-                raise HTTPException(status_code=500, detail="Failed to capture frame.")
-            cv2.imshow("Recognition", frame)
-            key = cv2.waitKey(1) & 0xFF
-            if key == 32:  # Space key
-                # Generate live embedding
-                live_embedding = DeepFace.represent(frame, enforce_detection=False, detector_backend="mtcnn")
-                break
-            elif key == 27:  # Escape key
-                raise HTTPException(status_code=400, detail="Recognition cancelled.")
-    finally:
-        camera.release()
-        cv2.destroyAllWindows()
+    # Capture a frame and generate the live embedding
+    live_embedding = model_pool.represent(capture_frame("Recognition"))
 
     if live_embedding:
-        user, similarity, details = compare_embeddings(live_embedding[0]["embedding"], embeddings)
+        user, similarity, details = compare_embeddings(live_embedding[0]["embedding"], gallery)
         if user:
             return {
                 "message": "Face recognized.",
@@ -172,6 +181,17 @@ def recognize_face():
     return {"message": "No match found."}
 
 
+@app.post("/recognize/faces")
+def recognize_group():
+    """Recognizes every face in one webcam frame (up to FACE_MAX_FACES, largest first)."""
+    if not len(gallery):
+        raise HTTPException(status_code=400, detail="No registered users found.")
+
+    faces = model_pool.represent(capture_frame("Recognition"))
+    with stage("match"):
+        return {"faces": recognize_faces(faces, gallery, config.MAX_FACES, threshold=0.4)}
+
+
 # Run the app
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
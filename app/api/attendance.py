@@ -5,10 +5,10 @@ from app.schemas import AttendanceLog
 router = APIRouter()
 
 @router.post("/capture")
-async def capture_attendance_route(photo: UploadFile = File(...)):
+async def capture_attendance_route(photo: UploadFile = File(...), action: str = "check_in"):
     # Save the uploaded photo temporarily
     photo_path = f"/static/{photo.filename}"
-    return await capture_attendance(photo_path)
+    return await capture_attendance(photo_path, action)
 
 
 @router.post("/log")
@@ -1,3 +1,4 @@
+from typing import List
 from fastapi import APIRouter, File, UploadFile
 from app.services import register_employee
 from app.schemas import EmployeeCreate
@@ -5,9 +6,9 @@ from app.schemas import EmployeeCreate
 router = APIRouter()
 
 @router.post("/register")
-async def register_employee_route(employee: EmployeeCreate, photo: UploadFile = File(...)):
-    # Save the uploaded file (image)
-    photo_path = f"/static/{photo.filename}"  # For simplicity, we're storing the filename
+async def register_employee_route(employee: EmployeeCreate, photos: List[UploadFile] = File(...)):
+    # Save the uploaded files (several photos of the same person improve matching)
+    photo_paths = [f"/static/{photo.filename}" for photo in photos]  # For simplicity, we're storing the filenames
     return await register_employee(
-        employee.employee_id, employee.name, employee.email, employee.department, photo_path
+        employee.employee_id, employee.name, employee.email, employee.department, photo_paths
     )
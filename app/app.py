@@ -1,9 +1,15 @@
 from fastapi import FastAPI
+from app import config
 from app.api import employee, attendance
+from app.embedding_cache import embedding_cache, prepare_vector_search
+from instrumentation import instrument
 from tortoise.contrib.fastapi import register_tortoise
 
 app = FastAPI()
 
+# Request latency histograms, cached employee count and /metrics
+instrument(app, gallery_size=lambda: len(embedding_cache))
+
 # Registering the routes
 app.include_router(employee.router)
 app.include_router(attendance.router)
@@ -16,3 +22,12 @@ register_tortoise(
     generate_schemas=True,
     add_exception_handlers=True,
 )
+
+
+# Registered after Tortoise so the database connection is ready
+@app.on_event("startup")
+async def load_embedding_cache():
+    if config.EMBEDDING_SEARCH == "sql":
+        await prepare_vector_search(config.FACE_MATCH_METRIC)
+    else:
+        await embedding_cache.load()
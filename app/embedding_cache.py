@@ -0,0 +1,201 @@
+import numpy as np
+from tortoise import connections
+from app import config
+from app.face_recognition import best_matches, face_distances
+from app.models import Employee
+
+
+class EmbeddingCache:
+    """Employee face encodings held in one NumPy matrix keyed by employee pk.
+
+    Loaded once from the database, then kept current by add()/remove() so
+    nearest-neighbour queries never need a database round trip. Employees
+    enrolled from several photos are searched by their centroid, and the
+    closest RESCORE_CANDIDATES are re-scored against their templates.
+    """
+
+    def __init__(self):
+        self.pks = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, 128), dtype=np.float64)
+        self.templates = {}
+        self.loaded = False
+
+    def __len__(self):
+        return len(self.pks)
+
+    async def load(self):
+        rows = await Employee.all().values_list("id", "face_embedding", "face_templates")
+        self.pks = np.array([pk for pk, _, _ in rows], dtype=np.int64)
+        if rows:
+            self.matrix = np.stack([np.frombuffer(embedding, dtype=np.float64) for _, embedding, _ in rows])
+        else:
+            self.matrix = np.empty((0, 128), dtype=np.float64)
+        self.templates = {pk: _templates(templates) for pk, _, templates in rows if templates}
+        self.loaded = True
+        return self
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await self.load()
+        return self
+
+    def add(self, pk: int, face_embedding: bytes, face_templates: bytes = None):
+        if face_templates:
+            self.templates[pk] = _templates(face_templates)
+        else:
+            self.templates.pop(pk, None)
+        vector = np.frombuffer(face_embedding, dtype=np.float64)[np.newaxis]
+        existing = np.flatnonzero(self.pks == pk)
+        if existing.size:
+            matrix = self.matrix.copy()
+            matrix[existing[0]] = vector[0]
+            self.matrix = matrix
+        else:
+            self.matrix = np.vstack([self.matrix, vector])
+            self.pks = np.append(self.pks, pk)
+
+    def remove(self, pk: int):
+        self.templates.pop(pk, None)
+        keep = self.pks != pk
+        self.pks, self.matrix = self.pks[keep], self.matrix[keep]
+
+    def nearest(self, face_embedding: bytes, k: int = 1, metric: str = "euclidean"):
+        """Returns up to k (pk, distance) pairs, closest first."""
+        shortlist = max(k, config.RESCORE_CANDIDATES) if self.templates else k
+        matches = best_matches(face_embedding, self.matrix, shortlist, metric, threshold=np.inf)
+        matches = [(int(self.pks[i]), distance) for i, distance in matches]
+        return rescore(face_embedding, matches, self.templates, metric)[:k]
+
+
+embedding_cache = EmbeddingCache()
+
+
+def _templates(face_templates: bytes) -> np.ndarray:
+    return np.frombuffer(face_templates, dtype=np.float64).reshape(-1, 128)
+
+
+def rescore(face_embedding: bytes, matches: list, templates: dict, metric: str = "euclidean"):
+    """Replaces each (pk, centroid distance) with the distance to that employee's closest template."""
+    rescored = []
+    for pk, distance in matches:
+        if pk in templates:
+            distance = min(distance, float(face_distances(face_embedding, templates[pk], metric).min()))
+        rescored.append((pk, distance))
+    return sorted(rescored, key=lambda match: match[1])
+
+
+# pgvector operator and index opclass, and the SQLite function name, for each metric
+PGVECTOR_OPERATORS = {"euclidean": ("<->", "vector_l2_ops"), "cosine": ("<=>", "vector_cosine_ops")}
+
+
+def _sqlite_distance(metric: str):
+    def distance(a: bytes, b: bytes) -> float:
+        if a is None or b is None:
+            return float("inf")
+        return float(face_distances(a, b, metric)[0])
+
+    return distance
+
+
+def _vector_literal(face_embedding: bytes) -> str:
+    return "[" + ",".join(f"{v:.8f}" for v in np.frombuffer(face_embedding, dtype=np.float64)) + "]"
+
+
+async def prepare_vector_search(metric: str = "euclidean", connection_name: str = "default"):
+    """Sets up SQL-side nearest-neighbour search for the configured database.
+
+    On Postgres this needs the pgvector extension and adds an indexed
+    `face_vector` column; on SQLite (the local stand-in) `face_vector` is a
+    BLOB copy of the encoding and `euclidean_distance` and
+    `cosine_distance` functions are registered over it. Either way,
+    employees enrolled before the column existed are backfilled from
+    `face_embedding`, so sql_nearest() can match them.
+    """
+    connection = connections.get(connection_name)
+    dialect = connection.capabilities.dialect
+    if dialect == "postgres":
+        _, opclass = PGVECTOR_OPERATORS[metric]
+        await connection.execute_script(
+            "CREATE EXTENSION IF NOT EXISTS vector;"
+            "ALTER TABLE employee ADD COLUMN IF NOT EXISTS face_vector vector(128);"
+            f"CREATE INDEX IF NOT EXISTS employee_face_vector_{metric}_idx ON employee "
+            f"USING hnsw (face_vector {opclass});"
+        )
+    elif dialect == "sqlite":
+        _, columns = await connection.execute_query("PRAGMA table_info(employee)")
+        if "face_vector" not in {column["name"] for column in columns}:
+            await connection.execute_script("ALTER TABLE employee ADD COLUMN face_vector BLOB")
+        # Tortoise exposes no public hook for SQL functions, so register on the aiosqlite connection
+        for name in PGVECTOR_OPERATORS:
+            await connection._connection.create_function(
+                f"{name}_distance", 2, _sqlite_distance(name), deterministic=True
+            )
+    else:
+        raise ValueError(f"Vector search is not supported on {dialect}")
+    await backfill_vectors(connection_name)
+
+
+async def backfill_vectors(connection_name: str = "default", batch_size: int = 500) -> int:
+    """Fills `face_vector` for employees that only have `face_embedding`; returns how many were updated."""
+    connection = connections.get(connection_name)
+    dialect = connection.capabilities.dialect
+    query = (
+        "UPDATE employee SET face_vector = $1::vector WHERE id = $2"
+        if dialect == "postgres"
+        else "UPDATE employee SET face_vector = ? WHERE id = ?"
+    )
+    updated = 0
+    while True:
+        # Each batch drops out of the NULL filter once written, so no offset is needed
+        _, rows = await connection.execute_query(
+            "SELECT id, face_embedding FROM employee WHERE face_vector IS NULL ORDER BY id LIMIT "
+            + str(int(batch_size))
+        )
+        if not rows:
+            return updated
+        await connection.execute_many(
+            query, [[_column_value(dialect, row["face_embedding"]), row["id"]] for row in rows]
+        )
+        updated += len(rows)
+
+
+def _column_value(dialect: str, face_embedding: bytes):
+    return _vector_literal(face_embedding) if dialect == "postgres" else face_embedding
+
+
+async def store_vector(pk: int, face_embedding: bytes, connection_name: str = "default"):
+    """Mirrors an employee's encoding into the `face_vector` column."""
+    connection = connections.get(connection_name)
+    dialect = connection.capabilities.dialect
+    placeholder = "$1::vector WHERE id = $2" if dialect == "postgres" else "? WHERE id = ?"
+    await connection.execute_query(
+        f"UPDATE employee SET face_vector = {placeholder}", [_column_value(dialect, face_embedding), pk]
+    )
+
+
+async def sql_nearest(face_embedding: bytes, k: int = 1, metric: str = "euclidean", connection_name: str = "default"):
+    """Returns up to k (pk, distance) pairs computed by the database.
+
+    The database ranks centroids; the closest candidates are then re-scored
+    in Python against their enrolled templates.
+    """
+    limit, k = k, max(k, config.RESCORE_CANDIDATES)
+    operator, _ = PGVECTOR_OPERATORS[metric]
+    connection = connections.get(connection_name)
+    if connection.capabilities.dialect == "postgres":
+        _, rows = await connection.execute_query(
+            f"SELECT id, face_vector {operator} $1::vector AS distance FROM employee "
+            "WHERE face_vector IS NOT NULL ORDER BY distance LIMIT $2",
+            [_vector_literal(face_embedding), k],
+        )
+    else:
+        _, rows = await connection.execute_query(
+            f"SELECT id, {metric}_distance(face_vector, ?) AS distance FROM employee "
+            "WHERE face_vector IS NOT NULL ORDER BY distance LIMIT ?",
+            [face_embedding, k],
+        )
+    matches = [(int(row["id"]), float(row["distance"])) for row in rows]
+    templates = await Employee.filter(id__in=[pk for pk, _ in matches], face_templates__isnull=False).values_list(
+        "id", "face_templates"
+    )
+    return rescore(face_embedding, matches, {pk: _templates(t) for pk, t in templates}, metric)[:limit]
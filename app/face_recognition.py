@@ -1,9 +1,11 @@
-import face_recognition
 import numpy as np
 
 
 def generate_face_embedding(photo: str) -> bytes:
     """Generate the facial embedding from the provided image."""
+    # Imported here so the distance helpers below work without dlib installed
+    import face_recognition
+
     # Assuming the photo is a base64 string or file path
     image = face_recognition.load_image_file(photo)
     encoding = face_recognition.face_encodings(image)
@@ -13,9 +15,69 @@ def generate_face_embedding(photo: str) -> bytes:
         raise Exception("No face found in the image")
 
 
-def compare_faces(captured_embedding: bytes, stored_embedding: bytes) -> float:
-    """Compare the captured face embedding with the stored one."""
-    captured_embedding = np.frombuffer(captured_embedding, dtype=np.float64)
-    stored_embedding = np.frombuffer(stored_embedding, dtype=np.float64)
-    
-    return np.linalg.norm(captured_embedding - stored_embedding)  # Euclidean distance, or use cosine similarity
+def combine_face_embeddings(embeddings: list) -> tuple:
+    """Returns (centroid, templates) bytes for one or more encodings of the same person."""
+    matrix = _as_matrix(embeddings)
+    templates = matrix.tobytes() if len(matrix) > 1 else None
+    return matrix.mean(axis=0).tobytes(), templates
+
+
+# Largest distance that still counts as the same person, per metric, for dlib's 128-d encodings
+METRIC_THRESHOLDS = {
+    "euclidean": 0.6,
+    "cosine": 0.07,
+}
+
+
+def _as_matrix(embeddings) -> np.ndarray:
+    """Accepts one encoding, a list of encodings or an (N, 128) array, as bytes or floats."""
+    if isinstance(embeddings, (bytes, bytearray, memoryview)):
+        return np.frombuffer(embeddings, dtype=np.float64)[np.newaxis]
+    if len(embeddings) and isinstance(embeddings[0], (bytes, bytearray, memoryview)):
+        return np.stack([np.frombuffer(e, dtype=np.float64) for e in embeddings])
+    return np.atleast_2d(np.asarray(embeddings, dtype=np.float64))
+
+
+def threshold_for(metric: str, threshold: float = None) -> float:
+    if metric not in METRIC_THRESHOLDS:
+        raise ValueError(f"Unknown metric: {metric}")
+    return METRIC_THRESHOLDS[metric] if threshold is None else threshold
+
+
+def face_distances(captured_embedding, stored_embeddings, metric: str = "euclidean") -> np.ndarray:
+    """Distances from one captured embedding to every stored embedding, in one pass.
+
+    Lower is closer for both metrics; cosine returns 1 - cosine similarity.
+    """
+    threshold_for(metric)
+    probe = _as_matrix(captured_embedding)[0]
+    matrix = _as_matrix(stored_embeddings)
+    if not len(matrix):
+        return np.empty(0)
+    if metric == "euclidean":
+        return np.linalg.norm(matrix - probe, axis=1)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(probe)
+    return 1.0 - (matrix @ probe) / np.maximum(norms, 1e-12)
+
+
+def best_matches(captured_embedding, stored_embeddings, k: int = 1, metric: str = "euclidean", threshold: float = None):
+    """Returns up to k (row index, distance) pairs within the threshold, closest first."""
+    distances = face_distances(captured_embedding, stored_embeddings, metric)
+    if not len(distances):
+        return []
+    k = min(k, len(distances))
+    closest = np.argpartition(distances, k - 1)[:k]
+    closest = closest[np.argsort(distances[closest])]
+    limit = threshold_for(metric, threshold)
+    return [(int(i), float(distances[i])) for i in closest if distances[i] <= limit]
+
+
+def best_match(captured_embedding, stored_embeddings, metric: str = "euclidean", threshold: float = None):
+    """Returns the closest (row index, distance) within the threshold, or None."""
+    matches = best_matches(captured_embedding, stored_embeddings, 1, metric, threshold)
+    return matches[0] if matches else None
+
+
+def compare_faces(captured_embedding: bytes, stored_embedding: bytes, metric: str = "euclidean") -> float:
+    """Distance between two face embeddings; lower means more alike."""
+    return float(face_distances(captured_embedding, stored_embedding, metric)[0])
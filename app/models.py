@@ -7,7 +7,8 @@ class Employee(Model):
     name = fields.CharField(max_length=255)
     email = fields.CharField(max_length=255)
     department = fields.CharField(max_length=255)
-    face_embedding = fields.BinaryField()
+    face_embedding = fields.BinaryField()  # centroid of face_templates when several photos were enrolled
+    face_templates = fields.BinaryField(null=True)  # every enrolled encoding, concatenated float64
     photo_url = fields.CharField(max_length=255)
 
     def __str__(self):
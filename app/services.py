@@ -1,14 +1,25 @@
 from app.models import Employee, Attendance
 from datetime import datetime
-from app.face_recognition import generate_face_embedding, compare_faces
+from app import config
+from app.embedding_cache import embedding_cache, sql_nearest, store_vector
+from app.face_recognition import combine_face_embeddings, generate_face_embedding, threshold_for
+from executor import InferenceExecutor
+from instrumentation import stage
 from fastapi import HTTPException
 
-async def register_employee(employee_id: str, name: str, email: str, department: str, photo: str):
-    # Generate face embedding from the photo (this should be a base64 string)
+# Face encoding is CPU-bound, so it runs off the event loop on a bounded pool
+executor = InferenceExecutor(config.EXECUTOR_KIND, config.EXECUTOR_WORKERS, config.EXECUTOR_MAX_PENDING)
+
+async def register_employee(employee_id: str, name: str, email: str, department: str, photos: list):
+    # Generate one face embedding per photo (each should be a base64 string or path)
+    photos = [photos] if isinstance(photos, str) else photos
     try:
-        face_embedding = generate_face_embedding(photo)
+        embeddings = [await executor.run(generate_face_embedding, photo) for photo in photos]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail="Error generating face embedding")
+    face_embedding, face_templates = combine_face_embeddings(embeddings)
 
     employee = await Employee.create(
         employee_id=employee_id,
@@ -16,25 +27,39 @@ async def register_employee(employee_id: str, name: str, email: str, department:
         email=email,
         department=department,
         face_embedding=face_embedding,
-        photo_url=f"/static/{photo}",  # Just storing the path for now
+        face_templates=face_templates,
+        photo_url=f"/static/{photos[0]}",  # Just storing the path for now
     )
+    if config.EMBEDDING_SEARCH == "sql":
+        await store_vector(employee.pk, face_embedding)
+    else:
+        await embedding_cache.ensure_loaded()
+        embedding_cache.add(employee.pk, face_embedding, face_templates)
     return {"message": "Employee registered successfully"}
 
 
-async def capture_attendance(photo: str):
+async def capture_attendance(photo: str, action: str = "check_in"):
     # Generate the face embedding from the uploaded photo
     try:
-        captured_embedding = generate_face_embedding(photo)
+        with stage("embed"):
+            captured_embedding = await executor.run(generate_face_embedding, photo)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail="Error generating face embedding")
 
-    # Compare the captured embedding with stored embeddings
-    employees = await Employee.all()
-    for employee in employees:
-        similarity = compare_faces(captured_embedding, employee.face_embedding)
-        if similarity >= 0.9:  # Assume 90% match threshold
-            return await log_attendance(employee)
-    
+    # Find the closest stored embedding without scanning the Employee table
+    metric = config.FACE_MATCH_METRIC
+    with stage("match"):
+        if config.EMBEDDING_SEARCH == "sql":
+            matches = await sql_nearest(captured_embedding, metric=metric)
+        else:
+            matches = (await embedding_cache.ensure_loaded()).nearest(captured_embedding, metric=metric)
+    tolerance = threshold_for(metric, config.FACE_MATCH_TOLERANCE or None)
+    if matches and matches[0][1] <= tolerance:
+        employee = await Employee.get(pk=matches[0][0])
+        return await log_attendance(employee, action)
+
     raise HTTPException(status_code=400, detail="Face not recognized")
 
 
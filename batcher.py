@@ -0,0 +1,96 @@
+import asyncio
+import time
+from fastapi import HTTPException
+from metrics import Gauge, Histogram
+
+
+QUEUE_DEPTH = Gauge("inference_queue_depth", "Images waiting for a batched forward pass.")
+BATCH_SIZE = Histogram(
+    "inference_batch_size", "Images per batched forward pass.", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+QUEUE_WAIT = Histogram("inference_queue_wait_seconds", "Time an image waited in the queue before its batch ran.")
+
+
+class MicroBatcher:
+    """Collects concurrent embedding requests into batched forward passes.
+
+    A batch is dispatched as soon as it holds `max_batch_size` images or the
+    oldest image has waited `max_wait_ms`, whichever comes first. Batches run
+    on `executor` (see executor.py), at most one per executor worker, so
+    images keep accumulating into larger batches while all workers are busy.
+    Each caller awaits its own future and receives only its own result.
+    """
+
+    def __init__(self, infer_batch, executor, max_batch_size=16, max_wait_ms=5, max_queue=256):
+        self.infer_batch = infer_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self._queue = None
+        self._worker = None
+        self._slots = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.executor.max_workers)
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, image):
+        """Queues one image and waits for its representations, or raises 503 when full."""
+        if self._queue.qsize() >= self.max_queue:
+            raise HTTPException(status_code=503, detail="Server is busy, please retry shortly.")
+        future = asyncio.get_running_loop().create_future()
+        QUEUE_DEPTH.inc()
+        await self._queue.put((image, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = batch[0][2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            dispatched = time.perf_counter()
+            QUEUE_DEPTH.dec(len(batch))
+            BATCH_SIZE.observe(len(batch))
+            for _, _, queued in batch:
+                QUEUE_WAIT.observe(dispatched - queued)
+
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        images = [image for image, _, _ in batch]
+        try:
+            results = await self.executor.run(self.infer_batch, images)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,83 @@
+import argparse
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+import numpy as np
+from cascade_detector import CascadeDetector, deepface_faces
+from opencv.detection import read_frames, recall
+
+
+def boxes(faces):
+    return [tuple(face["facial_area"][key] for key in ("x", "y", "w", "h")) for face in faces]
+
+
+def timed_detections(detect, frames):
+    latencies, detections = [], []
+    for frame in frames:
+        started = time.perf_counter()
+        detections.append(boxes(detect(frame)))
+        latencies.append(time.perf_counter() - started)
+    return np.asarray(latencies), detections
+
+
+def latency_summary(latencies):
+    return {
+        "mean_ms": round(float(latencies.mean()) * 1000, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+    }
+
+
+def main():
+    """Compares the Haar -> accurate-detector cascade with the accurate detector alone; prints JSON."""
+    parser = argparse.ArgumentParser(description="Detection latency and recall: cascade versus full-frame detector.")
+    parser.add_argument("source", help="Video file or folder of frames")
+    parser.add_argument("--detector", default="mtcnn", help="DeepFace backend used alone and inside the cascade")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many frames")
+    parser.add_argument("--downscale", type=float, default=0.5)
+    parser.add_argument("--padding", type=float, default=0.4)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed to count a reference face as found")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    frames = read_frames(args.source, args.limit, grey=False)
+    if not frames:
+        raise SystemExit(f"No frames could be read from {args.source}")
+
+    with redirect_stdout(sys.stderr):
+        accurate = deepface_faces(args.detector)
+        cascade = CascadeDetector(accurate=accurate, downscale=args.downscale, padding=args.padding)
+        # Build the detector models before timing anything
+        accurate(frames[0])
+        cascade.extract_faces(frames[0])
+        cascade.early_exits = 0
+
+        full_latencies, reference = timed_detections(accurate, frames)
+        cascade_latencies, detections = timed_detections(cascade.extract_faces, frames)
+
+    report = {
+        "frames": len(frames),
+        "reference_faces": sum(len(found) for found in reference),
+        "detector": args.detector,
+        "downscale": args.downscale,
+        "padding": args.padding,
+        f"{args.detector}_only": latency_summary(full_latencies),
+        "cascade": {
+            **latency_summary(cascade_latencies),
+            "recall": round(recall(detections, reference, args.iou), 4),
+            "early_exit_share": round(cascade.early_exits / len(frames), 4),
+            "faces": sum(len(found) for found in detections),
+        },
+        "speedup": round(float(full_latencies.sum() / cascade_latencies.sum()), 2),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
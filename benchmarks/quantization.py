@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+import numpy as np
+from benchmarks.synthetic import probes_near, random_vectors, user_name, write_store
+from embedding_store import EmbeddingStore
+from gallery import EmbeddingGallery
+import matcher
+
+
+def evaluate(gallery, probes, rows, top_k):
+    """Returns (top-k user lists, top-1 accuracy, per-probe latencies) for one gallery."""
+    results, latencies = [], []
+    for probe in probes:
+        started = time.perf_counter()
+        matches = matcher.match_embeddings(probe, gallery, top_k=top_k, threshold=2.0)
+        latencies.append(time.perf_counter() - started)
+        results.append([match.user for match in matches])
+    accuracy = np.mean([bool(users) and users[0] == user_name(row) for users, row in zip(results, rows)])
+    return results, float(accuracy), np.asarray(latencies)
+
+
+def compare(store_folder, probes, rows, kinds, top_k):
+    exact_gallery = EmbeddingGallery(store=EmbeddingStore(store_folder)).load()
+    exact, exact_accuracy, latencies = evaluate(exact_gallery, probes, rows, top_k)
+    report = [{
+        "mode": "float32",
+        "gallery_bytes": int(exact_gallery.matrix.nbytes),
+        "top1_accuracy": round(exact_accuracy, 4),
+        "p50_ms": round(float(np.median(latencies)) * 1000, 4),
+    }]
+    for kind in kinds:
+        gallery = EmbeddingGallery(store=EmbeddingStore(store_folder), quantize=kind).load()
+        results, accuracy, latencies = evaluate(gallery, probes, rows, top_k)
+        report.append({
+            "mode": kind,
+            "gallery_bytes": int(gallery.codes.nbytes),
+            "shrink": round(exact_gallery.matrix.nbytes / gallery.codes.nbytes, 2),
+            "top1_accuracy": round(accuracy, 4),
+            "accuracy_delta": round(accuracy - exact_accuracy, 4),
+            "top1_agreement": round(float(np.mean([a[:1] == b[:1] for a, b in zip(results, exact)])), 4),
+            f"recall_at_{top_k}": round(
+                float(np.mean([len(set(a) & set(b)) / max(1, len(b)) for a, b in zip(results, exact)])), 4
+            ),
+            "p50_ms": round(float(np.median(latencies)) * 1000, 4),
+        })
+    return report
+
+
+def main():
+    """Measures quantized-gallery accuracy and size against exact float32 matching; prints JSON."""
+    parser = argparse.ArgumentParser(description="Accuracy of quantized galleries versus the exact matcher.")
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--probes", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.3, help="Probe noise relative to the vector norm")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=matcher.RERANK_CANDIDATES)
+    parser.add_argument("--kinds", default="float16,int8")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    matcher.RERANK_CANDIDATES = args.rerank
+    workdir = tempfile.mkdtemp(prefix="face-quant-")
+    results = []
+    try:
+        with redirect_stdout(sys.stderr):
+            for size in (int(size) for size in args.sizes.split(",")):
+                vectors = random_vectors(size, args.dim)
+                store_folder = os.path.join(workdir, f"store_{size}")
+                write_store(store_folder, vectors)
+                probes, rows = probes_near(vectors, args.probes, noise=args.noise)
+                for row in compare(store_folder, probes, rows, args.kinds.split(","), args.top_k):
+                    results.append({"gallery_size": size, **row})
+                shutil.rmtree(store_folder)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps({"dim": args.dim, "rerank": args.rerank, "noise": args.noise, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+import cv2
+import numpy as np
+from benchmarks import stub_model
+from benchmarks.synthetic import probes_near, random_vectors, user_name, write_face_records, write_store
+
+
+def summarize(name, size, latencies, items=None, **extra):
+    """Latency percentiles in milliseconds plus throughput for one timed path."""
+    latencies = np.asarray(latencies)
+    total = latencies.sum()
+    result = {
+        "benchmark": name,
+        "gallery_size": size,
+        "count": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 4),
+        "throughput_per_s": round((items or len(latencies)) / total, 2) if total else None,
+    }
+    result.update(extra)
+    return result
+
+
+def timed(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def bench_load(size, vectors, workdir, json_limit, repeat):
+    from embedding_store import EmbeddingStore
+    from gallery import EmbeddingGallery
+
+    results = []
+    store_folder = os.path.join(workdir, f"store_{size}")
+    write_store(store_folder, vectors)
+    latencies = timed(lambda: EmbeddingGallery(store=EmbeddingStore(store_folder)).load(), repeat)
+    results.append(summarize("load_store", size, latencies))
+
+    if size <= json_limit:
+        records = os.path.join(workdir, f"records_{size}")
+        write_face_records(records, vectors)
+        latencies = timed(lambda: EmbeddingGallery(records).load(), max(1, repeat // 2))
+        results.append(summarize("load_face_records", size, latencies))
+        shutil.rmtree(records)
+    return results, store_folder
+
+
+def bench_match(size, gallery, probes, rows, batch_size):
+    from matcher import best_match, match_embeddings
+
+    latencies, hits = [], 0
+    for probe, row in zip(probes, rows):
+        started = time.perf_counter()
+        match = best_match(probe, gallery, threshold=1.0)
+        latencies.append(time.perf_counter() - started)
+        hits += match is not None and match.user == user_name(row)
+    results = [summarize("match_single", size, latencies, top1_accuracy=round(hits / len(probes), 4))]
+
+    batches = [probes[i:i + batch_size] for i in range(0, len(probes), batch_size)]
+    latencies = []
+    for batch in batches:
+        started = time.perf_counter()
+        match_embeddings(batch, gallery, threshold=1.0)
+        latencies.append(time.perf_counter() - started)
+    results.append(summarize("match_batch", size, latencies, items=len(probes), batch_size=batch_size))
+    return results
+
+
+def bench_requests(size, client, uploads):
+    latencies = []
+    for upload in uploads:
+        started = time.perf_counter()
+        response = client.post("/recognize/", files={"photo": ("probe.jpg", upload, "image/jpeg")})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return [summarize("recognize_endpoint", size, latencies)]
+
+
+def run(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    workdir = tempfile.mkdtemp(prefix="face-bench-")
+    # Point the apps at empty scratch folders and keep the result cache out of the measurements
+    os.environ.update({
+        "FACE_RECORDS_FOLDER": os.path.join(workdir, "FaceRecords"),
+        "FACE_EMBEDDING_STORE": os.path.join(workdir, "EmbeddingStore"),
+        "FACE_RESULT_CACHE_SIZE": "0",
+    })
+    stub_model.install(args.dim)
+    from embedding_store import EmbeddingStore
+    from gallery import EmbeddingGallery
+
+    client = None
+    if args.requests:
+        from fastapi.testclient import TestClient
+        import react_api
+
+        client = TestClient(react_api.app).__enter__()
+        rng = np.random.default_rng(2)
+        uploads = [
+            cv2.imencode(".jpg", rng.integers(0, 255, (480, 640, 3), dtype=np.uint8))[1].tobytes()
+            for _ in range(args.requests)
+        ]
+
+    results = []
+    try:
+        for size in sizes:
+            vectors = random_vectors(size, args.dim)
+            load_results, store_folder = bench_load(size, vectors, workdir, args.json_limit, args.repeat)
+            results.extend(load_results)
+            gallery = EmbeddingGallery(store=EmbeddingStore(store_folder)).load()
+            probes, rows = probes_near(vectors, args.probes)
+            results.extend(bench_match(size, gallery, probes, rows, args.batch_size))
+            if client is not None:
+                react_api.gallery = gallery
+                results.extend(bench_requests(size, client, uploads))
+            shutil.rmtree(store_folder)
+    finally:
+        if client is not None:
+            client.__exit__(None, None, None)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    """Benchmarks gallery load, matching and /recognize/ on synthetic galleries and prints JSON."""
+    parser = argparse.ArgumentParser(description="Recognition benchmarks on synthetic galleries.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated gallery sizes, up to 1000000")
+    parser.add_argument("--dim", type=int, default=512, help="Embedding dimension (VGG-Face is 4096)")
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="/recognize/ calls per size; 0 skips them")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions of each load")
+    parser.add_argument("--json-limit", type=int, default=10000, help="Largest size also written as FaceRecords JSON")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # Progress output from the code under test goes to stderr, keeping stdout valid JSON
+    with redirect_stdout(sys.stderr):
+        results = run(args)
+
+    report = {
+        "dim": args.dim,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import sys
+import types
+import zlib
+import numpy as np
+
+
+DIM = 4096  # VGG-Face
+
+
+def _embed(img):
+    data = img.tobytes() if hasattr(img, "tobytes") else str(img).encode()
+    vector = np.random.default_rng(zlib.crc32(data)).standard_normal(DIM)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class StubModelPool:
+    """Stand-in for model_pool.ModelPool that needs no DeepFace install or model download.
+
+    Embeddings are random unit vectors seeded from the image contents, so
+    the same image always gets the same embedding.
+    """
+
+    ready = True
+
+    def warm_up(self):
+        return self
+
+    def start_warm_up(self):
+        pass
+
+    def represent(self, img, detector_backend=None):
+        return [{"embedding": _embed(img), "facial_area": {}, "face_confidence": 1.0}]
+
+    def represent_batch(self, images, detector_backend=None, check_quality=False):
+        return [self.represent(img) for img in images]
+
+
+def install(dim=DIM):
+    """Registers the stub as the `model_pool` module; call before importing react_api."""
+    global DIM
+    DIM = dim
+    module = types.ModuleType("model_pool")
+    module.model_pool = StubModelPool()
+    module.ModelPool = StubModelPool
+    module.warm_up_worker = lambda: None
+    module.represent = module.model_pool.represent
+    module.represent_batch = module.model_pool.represent_batch
+    module.represent_gated = module.model_pool.represent_batch
+    sys.modules["model_pool"] = module
+    return module
@@ -0,0 +1,48 @@
+import json
+import os
+import numpy as np
+from embedding_store import EmbeddingStore
+from gallery import normalize
+
+
+def random_vectors(count, dim, seed=0):
+    """Returns `count` random L2-normalized float32 vectors."""
+    return normalize(np.random.default_rng(seed).standard_normal((count, dim), dtype=np.float32))
+
+
+def user_name(i):
+    return f"user_{i:07d}"
+
+
+def user_details(i):
+    return {"name": user_name(i), "age": 20 + i % 50, "gender": "F" if i % 2 else "M"}
+
+
+def write_face_records(base_folder, vectors):
+    """Writes vectors in the FaceRecords/<user>/{embedding,details}.json layout."""
+    for i, vector in enumerate(vectors):
+        user_folder = os.path.join(base_folder, user_name(i))
+        os.makedirs(user_folder, exist_ok=True)
+        with open(os.path.join(user_folder, "embedding.json"), "w") as f:
+            json.dump([{"embedding": vector.tolist()}], f)
+        with open(os.path.join(user_folder, "details.json"), "w") as f:
+            json.dump(user_details(i), f)
+
+
+def write_store(folder, vectors, chunk=100000):
+    """Writes vectors into a binary EmbeddingStore, appending in chunks."""
+    store = EmbeddingStore(folder)
+    for start in range(0, len(vectors), chunk):
+        stop = min(start + chunk, len(vectors))
+        store.append_many(
+            [user_name(i) for i in range(start, stop)], vectors[start:stop], [user_details(i) for i in range(start, stop)]
+        )
+    return store
+
+
+def probes_near(vectors, count, noise=0.3, seed=1):
+    """Returns probes that are noisy copies of random gallery rows, plus the rows they came from."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(vectors), count)
+    noisy = vectors[rows] + noise * rng.standard_normal((count, vectors.shape[1]), dtype=np.float32) / np.sqrt(vectors.shape[1])
+    return normalize(noisy), rows
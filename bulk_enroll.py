@@ -0,0 +1,225 @@
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+import config
+from embedding_store import open_store
+from gallery import centroid, user_folder
+from imaging import decode_image
+from model_pool import represent, warm_up_worker
+
+
+class PhotoSource:
+    """Reads photos by relative path from a directory, a zip file, or zip bytes."""
+
+    def __init__(self, source):
+        self.folder = None
+        self.archive = None
+        if isinstance(source, (bytes, bytearray)):
+            self.archive = zipfile.ZipFile(io.BytesIO(source))
+        elif os.path.isdir(source):
+            self.folder = source
+        else:
+            self.archive = zipfile.ZipFile(source)
+
+    def read(self, name):
+        if self.archive is not None:
+            return self.archive.read(name)
+        folder = os.path.realpath(self.folder)
+        path = os.path.realpath(os.path.join(folder, name))
+        # Symlinks inside the folder may not lead out of it either
+        if os.path.commonpath([folder, path]) != folder:
+            raise FileNotFoundError(f"{name} is outside the photo folder")
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def safe_photo_path(photo):
+    """True for a relative photo path that stays inside the photo folder or zip."""
+    parts = photo.replace("\\", "/").split("/")
+    # A leading separator or drive letter is absolute on one platform or another
+    return not (photo.startswith(("/", "\\")) or ":" in parts[0] or ".." in parts or "\0" in photo)
+
+
+def read_manifest(details_file, base_folder=config.BASE_FOLDER):
+    """Reads the details CSV into {user: {"details": {...}, "photos": [...]}}.
+
+    Needs `name` and `photo` columns; every other column becomes a detail.
+    A person may have several rows, or several photos separated by ";".
+    Rows are skipped when the name is not a valid folder under
+    `base_folder` (see gallery.user_folder) or a photo path would leave
+    the photo folder or zip.
+    """
+    reader = csv.DictReader(details_file)
+    if not reader.fieldnames or not {"name", "photo"} <= set(reader.fieldnames):
+        raise ValueError("The details CSV needs at least 'name' and 'photo' columns.")
+    manifest = {}
+    for row in reader:
+        name = (row.pop("name") or "").strip()
+        photos = [photo.strip() for photo in (row.pop("photo") or "").split(";") if photo.strip()]
+        if not name or not all(safe_photo_path(photo) for photo in photos):
+            continue
+        try:
+            user_folder(base_folder, name)
+        except ValueError:
+            continue
+        details = {"name": name, **{key: (value or "").strip() for key, value in row.items() if key}}
+        if details.get("age", "").isdigit():
+            details["age"] = int(details["age"])
+        entry = manifest.setdefault(name, {"details": details, "photos": []})
+        entry["photos"].extend(photos)
+    return manifest
+
+
+def embed_photo(data):
+    """Decodes one photo and returns its face embedding; runs in a worker process."""
+    image = decode_image(data, config.DECODE_MAX_SIDE)
+    faces = represent(image)
+    # With enforce_detection off DeepFace falls back to the whole image at confidence 0
+    if not faces or faces[0].get("face_confidence", 1) == 0:
+        raise ValueError("No face found in the image.")
+    return faces[0]["embedding"]
+
+
+def read_journal(path):
+    """Returns the users already committed by an earlier, possibly interrupted, run."""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, "r") as f:
+        return {json.loads(line)["user"] for line in f if line.strip()}
+
+
+def _commit(ready, embeddings, manifest, store, base_folder, journal_path):
+    users = [user for user in ready if embeddings[user]]
+    if not users:
+        return 0
+    details = [manifest[user]["details"] for user in users]
+    templates = [np.array(embeddings[user]) if len(embeddings[user]) > 1 else None for user in users]
+    store.append_many(users, [centroid(embeddings[user]) for user in users], details, templates=templates)
+    for user, user_details in zip(users, details):
+        folder = user_folder(base_folder, user)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "details.json"), "w") as f:
+            json.dump(user_details, f, indent=4)
+    if journal_path:
+        with open(journal_path, "a") as f:
+            f.write("".join(json.dumps({"user": user}) + "\n" for user in users))
+            f.flush()
+            os.fsync(f.fileno())
+    return len(users)
+
+
+def enroll(manifest, source, store, base_folder=config.BASE_FOLDER, workers=0, commit_every=500, journal_path=None):
+    """Embeds every photo in the manifest on a process pool and writes the results to the store.
+
+    Users are committed with one store append per `commit_every` users and
+    recorded in the journal, so a rerun with the same journal skips them.
+    Returns a report with per-image failures and throughput.
+    """
+    done = read_journal(journal_path)
+    pending = {user: entry for user, entry in manifest.items() if user not in done}
+    jobs = iter([(user, photo) for user, entry in pending.items() for photo in entry["photos"]])
+    remaining = {user: len(entry["photos"]) for user, entry in pending.items()}
+    embeddings = {user: [] for user in pending}
+    ready = [user for user, count in remaining.items() if not count]
+    failures = [{"user": user, "photo": None, "error": "No photo listed."} for user in ready]
+    images, enrolled = 0, 0
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    def finish(user, photo, error=None):
+        if error is not None:
+            failures.append({"user": user, "photo": photo, "error": str(error)})
+        remaining[user] -= 1
+        if not remaining[user]:
+            ready.append(user)
+
+    # Spawned workers, since this may run inside a threaded server process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=warm_up_worker) as pool:
+        running = {}
+        while True:
+            # Keep a bounded number of photos in flight so large imports don't sit in memory
+            for user, photo in jobs:
+                try:
+                    running[pool.submit(embed_photo, source.read(photo))] = (user, photo)
+                except (OSError, KeyError) as e:
+                    finish(user, photo, e)
+                    continue
+                if len(running) >= workers * 4:
+                    break
+            if not running:
+                break
+            completed, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                user, photo = running.pop(future)
+                images += 1
+                try:
+                    embeddings[user].append(future.result())
+                    finish(user, photo)
+                except Exception as e:
+                    finish(user, photo, e)
+            if len(ready) >= commit_every:
+                enrolled += _commit(ready, embeddings, manifest, store, base_folder, journal_path)
+                ready.clear()
+    enrolled += _commit(ready, embeddings, manifest, store, base_folder, journal_path)
+
+    seconds = time.perf_counter() - started
+    return {
+        "enrolled": enrolled,
+        "skipped": len(manifest) - len(pending),
+        "images": images,
+        "failed": failures,
+        "seconds": round(seconds, 3),
+        "images_per_second": round(images / seconds, 2) if seconds else 0.0,
+    }
+
+
+def main():
+    """Bulk-enrolls people from a folder or zip of photos plus a details CSV."""
+    parser = argparse.ArgumentParser(description="Enroll many people at once into the embedding store.")
+    parser.add_argument("photos", help="Directory or zip file containing the photos")
+    parser.add_argument("details", help="CSV with name, photo and any other detail columns")
+    parser.add_argument("--base-folder", default=config.BASE_FOLDER)
+    parser.add_argument("--store", default=config.EMBEDDING_STORE)
+    parser.add_argument("--workers", type=int, default=config.BULK_WORKERS, help="0 uses every CPU")
+    parser.add_argument("--commit-every", type=int, default=config.BULK_COMMIT_EVERY)
+    parser.add_argument("--journal", help="Resume journal (defaults to <details>.journal)")
+    parser.add_argument("--report", help="Write per-image failures to this CSV")
+    args = parser.parse_args()
+
+    with open(args.details, newline="", encoding="utf-8-sig") as f:
+        manifest = read_manifest(f, args.base_folder)
+    store = open_store(args.store, args.base_folder)
+    report = enroll(
+        manifest,
+        PhotoSource(args.photos),
+        store,
+        args.base_folder,
+        args.workers,
+        args.commit_every,
+        args.journal or f"{args.details}.journal",
+    )
+
+    for failure in report["failed"]:
+        print(f"Failed {failure['photo']} ({failure['user']}): {failure['error']}")
+    if args.report:
+        with open(args.report, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["user", "photo", "error"])
+            writer.writeheader()
+            writer.writerows(report["failed"])
+    print(
+        f"Enrolled {report['enrolled']} people from {report['images']} images "
+        f"({len(report['failed'])} failed, {report['skipped']} already done) "
+        f"in {report['seconds']}s, {report['images_per_second']} images/s."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+import config
+from video_pipeline import haar_detector
+
+
+def deepface_faces(backend=None):
+    """Returns an accurate detector: BGR image -> DeepFace.extract_faces output, without the fallback face."""
+    from deepface import DeepFace
+
+    def detect(image):
+        faces = DeepFace.extract_faces(
+            image, detector_backend=backend or config.CASCADE_DETECTOR, enforce_detection=False, align=True
+        )
+        # With enforce_detection=False a miss comes back as the whole image with confidence 0
+        return [face for face in faces if (face.get("confidence") or 0) > 0]
+
+    return detect
+
+
+def _merge(boxes):
+    # Overlapping ROIs become their union, so no face is handed to the accurate detector twice
+    boxes = [list(box) for box in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]:
+                    x0, y0 = min(a[0], b[0]), min(a[1], b[1])
+                    x1, y1 = max(a[0] + a[2], b[0] + b[2]), max(a[1] + a[3], b[1] + b[3])
+                    boxes[i] = [x0, y0, x1 - x0, y1 - y0]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(box) for box in boxes]
+
+
+def _shift(facial_area, dx, dy):
+    shifted = {}
+    for key, value in facial_area.items():
+        if key == "x":
+            value += dx
+        elif key == "y":
+            value += dy
+        elif isinstance(value, (tuple, list)) and len(value) == 2:
+            # Landmarks such as left_eye / right_eye
+            value = (value[0] + dx, value[1] + dy)
+        shifted[key] = value
+    return shifted
+
+
+class CascadeDetector:
+    """Two-tier face detection: a cheap Haar pass, then an accurate detector on its candidates.
+
+    Haar runs on a `downscale`d greyscale copy of the frame; a frame without
+    candidates returns [] straight away. Otherwise each candidate box is
+    grown by `padding` (a fraction of its size) so the accurate detector
+    (MTCNN by default) sees the whole head, overlapping regions are merged,
+    and only those regions are passed on. `early_exits` counts the frames
+    that never reached the accurate detector. Faces come back in
+    DeepFace.extract_faces format with facial_area in full-frame
+    coordinates, so this is a drop-in for the detector step.
+    """
+
+    def __init__(self, accurate=None, haar=None, downscale=0.5, padding=0.4):
+        self.accurate = accurate or deepface_faces()
+        # More permissive than the video pipeline's settings: a missed face here is never recovered
+        self.haar = haar or haar_detector(scale_factor=1.1, min_neighbors=3, min_size=20)
+        self.downscale = downscale
+        self.padding = padding
+        self.early_exits = 0
+
+    def candidates(self, image):
+        """Padded candidate regions (x, y, w, h) in full-frame coordinates."""
+        grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        if self.downscale != 1.0:
+            grey = cv2.resize(grey, None, fx=self.downscale, fy=self.downscale, interpolation=cv2.INTER_AREA)
+        height, width = image.shape[:2]
+        regions = []
+        for box in self.haar(grey):
+            x, y, w, h = (v / self.downscale for v in box)
+            dx, dy = w * self.padding, h * self.padding
+            x0, y0 = max(0, int(x - dx)), max(0, int(y - dy))
+            x1, y1 = min(width, int(x + w + dx)), min(height, int(y + h + dy))
+            regions.append((x0, y0, x1 - x0, y1 - y0))
+        return _merge(regions)
+
+    def extract_faces(self, image):
+        """Detects faces in a BGR image (or image path) in DeepFace.extract_faces format."""
+        if isinstance(image, str):
+            image = cv2.imread(image)
+        regions = self.candidates(image)
+        if not regions:
+            self.early_exits += 1
+            return []
+        faces = []
+        for x, y, w, h in regions:
+            for face in self.accurate(np.ascontiguousarray(image[y:y + h, x:x + w])):
+                faces.append({**face, "facial_area": _shift(face["facial_area"], x, y)})
+        return faces
+
+
+def detector_from_config():
+    return CascadeDetector(downscale=config.CASCADE_DOWNSCALE, padding=config.CASCADE_PADDING)
@@ -0,0 +1,70 @@
+import os
+
+BASE_FOLDER = os.getenv("FACE_RECORDS_FOLDER", "FaceRecords")
+EMBEDDING_STORE = os.getenv("FACE_EMBEDDING_STORE", "EmbeddingStore")
+# How often each worker picks up registrations made by other workers
+GALLERY_REFRESH_SECONDS = float(os.getenv("FACE_GALLERY_REFRESH_SECONDS", "1"))
+
+# Approximate nearest-neighbour index; leave FACE_ANN_INDEX empty to use exact search
+ANN_INDEX_PATH = os.getenv("FACE_ANN_INDEX", "")
+ANN_NLIST = int(os.getenv("FACE_ANN_NLIST", "0"))  # 0 picks sqrt(gallery size)
+ANN_NPROBE = int(os.getenv("FACE_ANN_NPROBE", "8"))
+ANN_MIN_SIZE = int(os.getenv("FACE_ANN_MIN_SIZE", "1000"))  # users before a new index is trained
+
+# Compact gallery copy for the coarse scan ("float16" or "int8"; empty keeps exact float32 search),
+# and how many of its best candidates are re-ranked with the exact vectors. Only saves memory with
+# the embedding store, whose float32 matrix is memory-mapped; a FaceRecords gallery keeps it in RAM too
+GALLERY_QUANTIZE = os.getenv("FACE_GALLERY_QUANTIZE", "")
+RERANK_CANDIDATES = int(os.getenv("FACE_RERANK_CANDIDATES", "32"))
+
+# Multi-sample enrollment: samples kept per person, and how many centroid matches get re-scored against them
+ENROLL_MAX_SAMPLES = int(os.getenv("FACE_ENROLL_MAX_SAMPLES", "8"))
+RESCORE_CANDIDATES = int(os.getenv("FACE_RESCORE_CANDIDATES", "5"))
+
+# Multi-face recognition: most faces matched per frame, largest first (0 matches every face)
+MAX_FACES = int(os.getenv("FACE_MAX_FACES", "10"))
+
+# Bulk enrollment: worker processes (0 uses every CPU) and users written per store append
+BULK_WORKERS = int(os.getenv("FACE_BULK_WORKERS", "0"))
+BULK_COMMIT_EVERY = int(os.getenv("FACE_BULK_COMMIT_EVERY", "500"))
+# Cap for /register/bulk, whose worker processes (each loading the model) run beside the server's own
+BULK_SERVER_WORKERS = int(os.getenv("FACE_BULK_SERVER_WORKERS", "2"))
+
+# DeepFace model and detector shared by every embedding call
+MODEL_NAME = os.getenv("FACE_MODEL", "VGG-Face")
+DETECTOR_BACKEND = os.getenv("FACE_DETECTOR", "opencv")  # any DeepFace backend, or "cascade"
+
+# "cascade" detector: Haar on a downscaled frame, then this detector on the padded candidate regions only
+CASCADE_DETECTOR = os.getenv("FACE_CASCADE_DETECTOR", "mtcnn")
+CASCADE_DOWNSCALE = float(os.getenv("FACE_CASCADE_DOWNSCALE", "0.5"))
+CASCADE_PADDING = float(os.getenv("FACE_CASCADE_PADDING", "0.4"))  # fraction of the Haar box added per side
+
+# Quality gate between detection and embedding; faces failing it are not embedded
+QUALITY_GATE = os.getenv("FACE_QUALITY_GATE", "1") == "1"
+QUALITY_MIN_SIZE = int(os.getenv("FACE_QUALITY_MIN_SIZE", "48"))  # pixels, shorter side of the face box
+QUALITY_MIN_SHARPNESS = float(os.getenv("FACE_QUALITY_MIN_SHARPNESS", "25"))  # Laplacian variance
+QUALITY_MIN_BRIGHTNESS = float(os.getenv("FACE_QUALITY_MIN_BRIGHTNESS", "40"))
+QUALITY_MAX_BRIGHTNESS = float(os.getenv("FACE_QUALITY_MAX_BRIGHTNESS", "215"))
+QUALITY_MAX_YAW = float(os.getenv("FACE_QUALITY_MAX_YAW", "40"))  # degrees
+QUALITY_MAX_ROLL = float(os.getenv("FACE_QUALITY_MAX_ROLL", "30"))
+
+# Uploads are decoded in memory and scaled down so the longer side is at most this (0 keeps full size)
+DECODE_MAX_SIDE = int(os.getenv("FACE_DECODE_MAX_SIDE", "1280"))
+
+# Executor for CPU-bound inference: "thread" or "process" pool
+EXECUTOR_KIND = os.getenv("FACE_EXECUTOR", "thread")
+EXECUTOR_WORKERS = int(os.getenv("FACE_EXECUTOR_WORKERS", "2"))
+EXECUTOR_MAX_PENDING = int(os.getenv("FACE_EXECUTOR_MAX_PENDING", "32"))
+
+# Cache of recent /recognize/ results; near-duplicate matching is off unless the distance is >= 0
+RESULT_CACHE_SIZE = int(os.getenv("FACE_RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("FACE_RESULT_CACHE_TTL_SECONDS", "10"))
+RESULT_CACHE_NEAR_DISTANCE = int(os.getenv("FACE_RESULT_CACHE_NEAR_DISTANCE", "-1"))  # dHash bits, e.g. 4
+
+# /ws/recognize: most frames recognized per second on each connection (0 for no limit)
+STREAM_MAX_FPS = float(os.getenv("FACE_STREAM_MAX_FPS", "5"))
+
+# Micro-batching of concurrent /recognize/ embeddings
+BATCH_MAX_SIZE = int(os.getenv("FACE_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("FACE_BATCH_MAX_WAIT_MS", "5"))
+BATCH_MAX_QUEUE = int(os.getenv("FACE_BATCH_MAX_QUEUE", "256"))
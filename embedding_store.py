@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+from gallery import normalize, read_face_records
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only
+    fcntl = None
+
+
+class EmbeddingStore:
+    """Append-only binary store of L2-normalized float32 embeddings.
+
+    `embeddings.f32` holds the raw rows back to back and is opened with
+    np.memmap, so opening the store costs nothing until rows are touched and
+    every process mapping it shares the same pages. `index.jsonl` is the
+    sidecar log: a header line with the dimension followed by one line per
+    write ({"user", "offset", "details"}) or delete ({"user", "deleted":
+    true}). Users enrolled from several samples also carry "templates", the
+    offsets of their individual sample rows in `templates.f32`; "offset" is
+    then their centroid, so the matrix file only ever holds gallery rows.
+    Replaying the log gives each user's latest row; superseded rows stay in
+    the matrix file as dead space. Appends take an exclusive file lock, so
+    several worker processes can share one store.
+
+    Stores written before templates had their own file have no "templates"
+    key in the header; their template offsets point into the matrix file.
+    """
+
+    MATRIX_FILE = "embeddings.f32"
+    TEMPLATES_FILE = "templates.f32"
+    INDEX_FILE = "index.jsonl"
+    LOCK_FILE = "store.lock"
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.matrix_path = os.path.join(folder, self.MATRIX_FILE)
+        self.templates_path = os.path.join(folder, self.TEMPLATES_FILE)
+        self.index_path = os.path.join(folder, self.INDEX_FILE)
+        self.lock_path = os.path.join(folder, self.LOCK_FILE)
+        self._lock = threading.Lock()
+        self.dim = None
+        self.separate_templates = True
+        self.position = 0
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    def changed(self):
+        """Cheaply checks whether the index has grown since the last read."""
+        return self.exists() and os.path.getsize(self.index_path) != self.position
+
+    def rewind(self):
+        """Makes the next read_entries() replay the index from the start."""
+        self.position = 0
+
+    def read_entries(self):
+        """Returns index entries written since the previous call, oldest first."""
+        if not self.exists():
+            return []
+        with open(self.index_path, "rb") as f:
+            if self.position == 0:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return []
+                self._read_header(header)
+                self.position = f.tell()
+            f.seek(self.position)
+            data = f.read()
+        # Stop at the last complete line; a concurrent append may be half written
+        complete = data[:data.rfind(b"\n") + 1]
+        self.position += len(complete)
+        return [json.loads(line) for line in complete.splitlines() if line.strip()]
+
+    def _read_header(self, header):
+        header = json.loads(header)
+        self.dim = header["dim"]
+        self.separate_templates = "templates" in header
+
+    def _map(self, path):
+        rows = os.path.getsize(path) // (4 * self.dim) if os.path.exists(path) else 0
+        if not rows:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def memmap(self):
+        """Maps every row ever written, including dead ones."""
+        return self._map(self.matrix_path)
+
+    def templates_memmap(self):
+        """Maps the rows that entries' "templates" offsets point into."""
+        return self._map(self.templates_path if self.separate_templates else self.matrix_path)
+
+    @staticmethod
+    def _open_rows(path, dim):
+        f = open(path, "ab")
+        # Drop a partially written row left behind by an interrupted append
+        first = f.seek(0, os.SEEK_END) // (4 * dim)
+        f.truncate(first * 4 * dim)
+        f.seek(first * 4 * dim)
+        return f, first
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock:
+            os.makedirs(self.folder, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, user, vector, details):
+        """Appends one user's embedding and returns its row offset."""
+        return self.append_many([user], np.atleast_2d(vector), [details])[0]
+
+    def append_many(self, users, vectors, details, templates=None):
+        """Appends several embeddings in one write and returns their row offsets.
+
+        `templates` optionally gives each user's sample embeddings (or None),
+        which are written to the templates file.
+        """
+        vectors = normalize(np.atleast_2d(vectors))
+        templates = [None if t is None else normalize(np.atleast_2d(t)) for t in (templates or [None] * len(users))]
+        with self._exclusive():
+            if not self.exists():
+                header = json.dumps({"dim": int(vectors.shape[1]), "templates": self.TEMPLATES_FILE})
+                with open(self.index_path, "w") as f:
+                    f.write(header + "\n")
+                self._read_header(header)
+            elif self.dim is None:
+                with open(self.index_path, "r") as f:
+                    self._read_header(f.readline())
+            for rows in [vectors] + [t for t in templates if t is not None]:
+                if rows.shape[1] != self.dim:
+                    raise ValueError(f"Embedding has {rows.shape[1]} dimensions, store expects {self.dim}")
+
+            rows_file, row = self._open_rows(self.matrix_path, self.dim)
+            samples_file, sample_row = (
+                self._open_rows(self.templates_path, self.dim) if self.separate_templates else (rows_file, row)
+            )
+            try:
+                offsets, entries = [], []
+                for user, vector, user_details, samples in zip(users, vectors, details, templates):
+                    entry = {"user": user}
+                    if samples is not None:
+                        samples_file.write(samples.tobytes())
+                        entry["templates"] = list(range(sample_row, sample_row + len(samples)))
+                        sample_row += len(samples)
+                        if not self.separate_templates:
+                            row = sample_row
+                    rows_file.write(vector.tobytes())
+                    entry.update(offset=row, details=user_details)
+                    offsets.append(row)
+                    entries.append(entry)
+                    row += 1
+                    if not self.separate_templates:
+                        sample_row = row
+                for f in {rows_file, samples_file}:
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                rows_file.close()
+                samples_file.close()
+
+            with open(self.index_path, "a") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        return offsets
+
+    def delete(self, user):
+        """Marks a user's embedding as deleted."""
+        with self._exclusive():
+            if self.exists():
+                with open(self.index_path, "a") as f:
+                    f.write(json.dumps({"user": user, "deleted": True}) + "\n")
+
+
+def migrate(base_folder, store):
+    """Converts FaceRecords/*/embedding.json trees into the binary store."""
+    users, vectors, details = read_face_records(base_folder)
+    if users:
+        store.append_many(users, vectors, details)
+    return len(users)
+
+
+def open_store(folder, base_folder="FaceRecords"):
+    """Opens the store, migrating the legacy JSON tree the first time it is used."""
+    store = EmbeddingStore(folder)
+    if not store.exists():
+        migrate(base_folder, store)
+    return store
+
+
+def main():
+    """Migrates an existing FaceRecords tree into a binary embedding store."""
+    parser = argparse.ArgumentParser(description="Convert embedding.json files into the binary store.")
+    parser.add_argument("--base-folder", default="FaceRecords")
+    parser.add_argument("--store", default="EmbeddingStore")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    if store.exists():
+        print(f"Store {args.store} already exists; nothing to migrate.")
+        return
+    count = migrate(args.base_folder, store)
+    print(f"Migrated {count} embeddings from {args.base_folder} into {args.store}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException
+
+
+def _noop():
+    return None
+
+
+class InferenceExecutor:
+    """Runs CPU-bound work off the asyncio event loop with bounded concurrency.
+
+    `kind` selects a thread pool or a process pool; every worker runs
+    `initializer` once, e.g. so each process warms up its own model. At most
+    `max_pending` calls may be running or queued at a time; beyond that the
+    caller gets a 503 instead of joining an unbounded queue.
+    """
+
+    def __init__(self, kind="thread", max_workers=4, max_pending=32, initializer=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.initializer = initializer
+        self.pending = 0
+        self.ready = False
+        self._pool = None
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="inference", initializer=self.initializer
+                )
+        return self._pool
+
+    @property
+    def saturated(self):
+        return self.pending >= self.max_pending
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) in the pool, or raises 503 when saturated."""
+        if self.saturated:
+            raise HTTPException(status_code=503, detail="Server is busy, please retry shortly.")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._ensure_pool(), functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    async def warm_up(self):
+        """Starts every worker so their initializers run before traffic arrives."""
+        await asyncio.gather(*(self.run(_noop) for _ in range(self.max_workers)))
+        self.ready = True
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -2,8 +2,9 @@ import cv2
 import os
 import json
 from datetime import datetime
-from deepface import DeepFace
-import numpy as np
+import config
+from embedding_store import open_store
+from model_pool import model_pool
 
 
 def create_folder(folder_name):
@@ -12,19 +13,6 @@ def create_folder(folder_name):
         os.makedirs(folder_name)
 
 
-def make_serializable(obj):
-    """Converts non-serializable objects to serializable forms."""
-    if isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, np.generic):  # For numpy scalar types like float32
-        return obj.item()
-    elif isinstance(obj, dict):
-        return {k: make_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [make_serializable(i) for i in obj]
-    return obj
-
-
 def get_user_details():
     """Captures user details from input."""
     print("Enter the following details:")
@@ -51,7 +39,7 @@ def capture_photo(name):
         if key == 32:  # Space key
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"{name}_{timestamp}.jpg"
-            file_path = os.path.join("FaceRecords", name, filename)
+            file_path = os.path.join(config.BASE_FOLDER, name, filename)
             cv2.imwrite(file_path, frame)
             print(f"Photo saved as {file_path}")
             camera.release()
@@ -67,20 +55,20 @@ def capture_photo(name):
     return None
 
 
-def save_face_embedding(photo_path, embedding_file):
+def save_face_embedding(photo_path, user_details):
     """Extracts and saves face embedding."""
     try:
-        embedding = DeepFace.represent(img_path=photo_path, enforce_detection=False)
-        with open(embedding_file, "w") as f:
-            json.dump(make_serializable(embedding), f, indent=4)
-        print(f"Embedding saved in {embedding_file}")
+        embedding = model_pool.represent(photo_path)
+        store = open_store(config.EMBEDDING_STORE, config.BASE_FOLDER)
+        store.append(user_details["name"], embedding[0]["embedding"], user_details)
+        print(f"Embedding saved in {store.folder}")
     except Exception as e:
         print(f"Error saving face embedding: {e}")
 
 
 def main():
     """Main function to capture user details, photo, and save embeddings."""
-    base_folder = "FaceRecords"
+    base_folder = config.BASE_FOLDER
     create_folder(base_folder)
 
     # Step 1: Capture user details
@@ -99,8 +87,7 @@ def main():
 
     # Step 4: Save face embedding
     if photo_path:
-        embedding_file = os.path.join(user_folder, "embedding.json")
-        save_face_embedding(photo_path, embedding_file)
+        save_face_embedding(photo_path, user_details)
 
 
 if __name__ == "__main__":
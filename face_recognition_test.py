@@ -1,86 +1,60 @@
+import argparse
 import cv2
-import os
-import json
-from deepface import DeepFace
-from scipy.spatial.distance import cosine
+import config
+from embedding_store import open_store
+from gallery import EmbeddingGallery
+from model_pool import model_pool
+from video_pipeline import CaptureThread, StreamingRecognizer, draw_tracks
 
 
-def load_embeddings(base_folder="FaceRecords"):
+def load_embeddings(base_folder=config.BASE_FOLDER):
     """Loads all stored embeddings and user data."""
-    embeddings = {}
-    for user_folder in os.listdir(base_folder):
-        embedding_file = os.path.join(base_folder, user_folder, "embedding.json")
-        details_file = os.path.join(base_folder, user_folder, "details.json")
-        if os.path.exists(embedding_file) and os.path.exists(details_file):
-            with open(embedding_file, "r") as ef, open(details_file, "r") as df:
-                embeddings[user_folder] = {
-                    "embedding": json.load(ef),
-                    "details": json.load(df),
-                }
-    print(f"Loaded {len(embeddings)} embeddings for recognition.")
-    return embeddings
-
-
-def compare_embeddings(live_embedding, stored_embeddings, threshold=0.6):
-    """Compares live embedding with stored embeddings."""
-    best_match = None
-    highest_similarity = 0
-
-    for user, data in stored_embeddings.items():
-        stored_embedding = data["embedding"][0]["embedding"]
-        similarity = 1 - cosine(live_embedding, stored_embedding)
-
-        if similarity > highest_similarity and similarity > (1 - threshold):
-            highest_similarity = similarity
-            best_match = (user, similarity, data["details"])
-
-    return best_match
-
-
-def realtime_face_recognition():
-    """Perform real-time face recognition."""
-    embeddings = load_embeddings()
-    if not embeddings:
+    store = open_store(config.EMBEDDING_STORE, base_folder)
+    return EmbeddingGallery(base_folder, store=store, quantize=config.GALLERY_QUANTIZE).load()
+
+
+def realtime_face_recognition(source=0, detect_every=1, max_faces=config.MAX_FACES, threshold=0.6):
+    """Perform real-time face recognition.
+
+    Frames are captured on a background thread and run through the
+    detect/track/recognize pipeline, so only new or uncertain faces pay for
+    a full embedding while display runs at camera speed. Every face due for
+    recognition in a frame is embedded and matched in one batch, up to
+    `max_faces`. `source` may be a camera index or a video file path.
+    `threshold` is the cosine distance a match must stay under.
+    """
+    gallery = load_embeddings()
+    if not len(gallery):
         print("No embeddings found. Please register users using main.py first.")
         return
 
-    camera = cv2.VideoCapture(0)
+    model_pool.warm_up()
+    capture = CaptureThread(source, realtime=isinstance(source, int))
+    # Tracked Haar crops are embedded without re-detection or alignment, so keep the looser
+    # threshold this script has always used rather than the model's stricter default
+    recognizer = StreamingRecognizer(gallery, detect_every=detect_every, threshold=threshold, max_faces=max_faces)
+    capture.start()
     print("Press 'Q' to quit the video stream.")
 
-    while True:
-        ret, frame = camera.read()
-        if not ret:
-            print("Failed to grab frame.")
-            break
-
-        try:
-            # Extract embedding for the current frame
-            live_embedding = DeepFace.represent(frame, enforce_detection=False, detector_backend="mtcnn")
-            if live_embedding:
-                match = compare_embeddings(live_embedding[0]["embedding"], embeddings)
-                if match:
-                    user, similarity, details = match
-                    text = (
-                        f"Match: {details['name']}, "
-                        f"Age: {details['age']}, "
-                        f"Similarity: {similarity:.2f}"
-                    )
-                else:
-                    text = "No match found."
-                cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-
-        except Exception as e:
-            print(f"Error during recognition: {e}")
+    for _, frame in capture.frames():
+        tracks = recognizer.process(frame)
 
         # Show the video feed
-        cv2.imshow("Face Recognition", frame)
+        cv2.imshow("Face Recognition", draw_tracks(frame, tracks))
 
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-    camera.release()
+    capture.stop()
     cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
-    realtime_face_recognition()
+    parser = argparse.ArgumentParser(description="Real-time face recognition.")
+    parser.add_argument("--source", default="0", help="Camera index or video file path")
+    parser.add_argument("--detect-every", type=int, default=1, help="Run face detection every Nth frame")
+    parser.add_argument("--max-faces", type=int, default=config.MAX_FACES, help="Faces recognized per frame (0: all)")
+    args = parser.parse_args()
+    realtime_face_recognition(
+        int(args.source) if args.source.isdigit() else args.source, args.detect_every, args.max_faces
+    )
@@ -0,0 +1,335 @@
+import os
+import json
+import threading
+import numpy as np
+from quantized import QuantizedCodes
+
+
+def normalize(vectors):
+    """L2-normalizes a vector or each row of a matrix as float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def centroid(templates):
+    """Normalized mean of normalized sample embeddings, used as a person's single gallery row."""
+    return normalize(normalize(np.atleast_2d(templates)).mean(axis=0))
+
+
+def user_folder(base_folder, user):
+    """Returns base_folder/user, refusing ids that are not a single plain path component."""
+    if not user or user in (".", "..") or any(c in user for c in "/\\\0"):
+        raise ValueError(f"Invalid user name: {user!r}")
+    base = os.path.realpath(base_folder)
+    folder = os.path.join(base_folder, user)
+    # Also catches a symlink inside the base folder pointing elsewhere
+    if os.path.dirname(os.path.realpath(folder)) != base:
+        raise ValueError(f"Invalid user name: {user!r}")
+    return folder
+
+
+def read_face_records(base_folder):
+    """Reads (users, vectors, details) from a FaceRecords/*/embedding.json tree."""
+    users, vectors, details = [], [], []
+    if not os.path.isdir(base_folder):
+        return users, vectors, details
+    for user_folder in sorted(os.listdir(base_folder)):
+        embedding_file = os.path.join(base_folder, user_folder, "embedding.json")
+        details_file = os.path.join(base_folder, user_folder, "details.json")
+        if os.path.exists(embedding_file) and os.path.exists(details_file):
+            with open(embedding_file, "r") as ef, open(details_file, "r") as df:
+                embedding = json.load(ef)
+                if not embedding:
+                    continue
+                users.append(user_folder)
+                vectors.append(embedding[0]["embedding"])
+                details.append(json.load(df))
+    return users, vectors, details
+
+
+class EmbeddingGallery:
+    """Process-wide, in-memory gallery of enrolled face embeddings.
+
+    Embeddings live in one contiguous L2-normalized float32 matrix with
+    parallel arrays of user ids and details, so recognition never has to
+    touch the filesystem. Updates build new arrays (or extend into spare
+    capacity no published array covers) and publish the (matrix, user_ids,
+    details) triple with a single assignment, so readers take a consistent
+    snapshot() without holding the lock; arrays already published are never
+    written to. `positions` may briefly run ahead of or behind the snapshot,
+    so details_for() and templates_for() check it against one. An optional
+    approximate index (see ann_index.py) is kept in step with every update,
+    and `version` goes up on each one so callers can invalidate derived
+    results.
+
+    With an EmbeddingStore (see embedding_store.py) the store is the source
+    of truth: updates are appended to it and then replayed into memory, and
+    refresh() picks up rows appended by other processes. The matrix is
+    then always a zero-copy view of the store's memmap, so every worker
+    process shares the same pages: rows superseded by a re-registration or
+    a delete stay in place with a user id of None and are listed in
+    `dead_rows`, which matching masks out (see matcher.py). refresh() only
+    applies the new log entries; the id and detail arrays are copied only
+    when an entry supersedes a row, and otherwise just grow.
+
+    Users enrolled from several samples are represented in the matrix by the
+    centroid of their samples; the individual samples are kept as templates
+    for re-scoring the best candidates (see templates_for()).
+
+    With `quantize` ("float16" or "int8") a compact copy of the matrix is
+    kept in `codes` for the coarse scan, and matching only reads the exact
+    rows of the best candidates. Only store mode saves memory this way: its
+    float32 matrix is a memmap that then stays mostly on disk, whereas a
+    gallery loaded from FaceRecords keeps its float32 matrix in RAM next to
+    the codes. Rows added later are encoded with the existing scale, and
+    the codes are only re-fitted once the gallery has doubled since.
+    """
+
+    def __init__(self, base_folder="FaceRecords", store=None, quantize=None):
+        self.base_folder = base_folder
+        self.store = store
+        self.quantize = quantize or None
+        self.codes = None
+        self._lock = threading.RLock()
+        self._snapshot = (np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=object), np.empty(0, dtype=object))
+        self.positions = {}
+        self.dead_rows = np.empty(0, dtype=np.int64)
+        self.templates = {}
+        self.index = None
+        self.version = 0
+        self._template_rows = None
+        self._ids_buffer = np.empty(0, dtype=object)
+        self._details_buffer = np.empty(0, dtype=object)
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def matrix(self):
+        return self._snapshot[0]
+
+    @property
+    def user_ids(self):
+        return self._snapshot[1]
+
+    @property
+    def details(self):
+        return self._snapshot[2]
+
+    def snapshot(self):
+        """Returns the current (matrix, user_ids, details) triple."""
+        return self._snapshot
+
+    def load(self):
+        """Loads every user's embedding and details once, from the store if there is one."""
+        if self.store is not None:
+            with self._lock:
+                self.store.rewind()
+                self._apply_store_entries(self.store.read_entries(), reset=True)
+            print(f"Loaded {len(self)} embeddings for recognition.")
+            return self
+
+        users, vectors, details = read_face_records(self.base_folder)
+        with self._lock:
+            self._replace(users, vectors, details)
+        print(f"Loaded {len(users)} embeddings for recognition.")
+        return self
+
+    def refresh(self):
+        """Applies store entries written since the last load or refresh, e.g. by other workers."""
+        if self.store is None or not self.store.changed():
+            return False
+        with self._lock:
+            self._apply_store_entries(self.store.read_entries())
+        return True
+
+    def _row(self, user, snapshot):
+        row = self.positions[user]
+        if row >= len(snapshot[1]) or snapshot[1][row] != user:
+            raise KeyError(user)  # positions has already moved past this snapshot
+        return row
+
+    def details_for(self, user):
+        """Returns the stored details for a user id."""
+        snapshot = self._snapshot
+        return snapshot[2][self._row(user, snapshot)]
+
+    def templates_for(self, user):
+        """Returns a user's normalized sample embeddings, or just their gallery row."""
+        templates = self.templates.get(user)
+        if templates is None:
+            snapshot = self._snapshot
+            return snapshot[0][self._row(user, snapshot)][np.newaxis]
+        if self.store is not None:
+            # Store mode keeps template row offsets and reads them from the shared memmap
+            return self._template_rows[templates]
+        return templates
+
+    def live_rows(self):
+        """Returns (user ids, rows) for the users in the gallery, leaving out dead store rows."""
+        with self._lock:
+            users = list(self.positions)
+            rows = np.fromiter(self.positions.values(), dtype=np.int64, count=len(users))
+            return users, self.matrix[rows]
+
+    def attach_index(self, index):
+        """Attaches an approximate index and brings it up to date with the gallery."""
+        with self._lock:
+            index.sync(*self.live_rows())
+            self.index = index
+
+    def add(self, user, embedding, details):
+        """Adds a user to the gallery, replacing any previous entry for the same id.
+
+        `embedding` is one vector, or one row per sample for multi-sample
+        enrollment, in which case the samples are kept as templates.
+        """
+        templates = normalize(np.atleast_2d(embedding))
+        templates = templates if len(templates) > 1 else None
+        vector = centroid(embedding).reshape(1, -1)
+        with self._lock:
+            if self.store is not None:
+                self.store.append_many([user], vector, [details], templates=[templates])
+                self.refresh()
+                return
+            if templates is not None:
+                self.templates[user] = templates
+            else:
+                self.templates.pop(user, None)
+            matrix, user_ids, user_details = self.snapshot()
+            position = self.positions.get(user)
+            if position is not None:
+                matrix = np.array(matrix)
+                user_details = user_details.copy()
+                matrix[position] = vector[0]
+                user_details[position] = details
+                if self.codes is not None:
+                    self.codes = self.codes.replace(position, vector[0])
+            else:
+                matrix = vector if matrix.size == 0 else np.vstack([matrix, vector])
+                user_ids = np.append(user_ids, np.array([user], dtype=object))
+                user_details = np.append(user_details, np.array([details], dtype=object))
+            self._snapshot = (matrix, user_ids, user_details)
+            self.positions[user] = len(user_ids) - 1 if position is None else position
+            self._encode()
+            self.version += 1
+            if self.index is not None:
+                self.index.add(user, vector[0])
+
+    def remove(self, user):
+        """Removes a user from the gallery; unknown users are ignored."""
+        with self._lock:
+            if self.store is not None:
+                # Another worker may have registered the user since our last refresh,
+                # so the delete is recorded whether or not this process knows them
+                self.store.delete(user)
+                self.refresh()
+                return
+            position = self.positions.get(user)
+            if position is None:
+                return
+            matrix, user_ids, details = self.snapshot()
+            user_ids = np.delete(user_ids, position)
+            self._snapshot = (np.delete(matrix, position, axis=0), user_ids, np.delete(details, position))
+            self.templates.pop(user, None)
+            self.positions = {user_id: i for i, user_id in enumerate(user_ids)}
+            if self.codes is not None:
+                self.codes = self.codes.delete(position)
+            self._encode()
+            self.version += 1
+            if self.index is not None:
+                self.index.remove(user)
+
+    def _apply_store_entries(self, entries, reset=False):
+        if reset:
+            self.positions, self.templates, self.codes = {}, {}, None
+            self.dead_rows = np.empty(0, dtype=np.int64)
+            self._ids_buffer = np.empty(0, dtype=object)
+            self._details_buffer = np.empty(0, dtype=object)
+        # Only the new entries are applied. Rows past the published end are written straight into
+        # the buffers' spare capacity; clearing a superseded row needs a private copy first
+        end = 0 if reset else len(self.user_ids)
+        dead, changed, copied = [], {}, False
+        for entry in entries:
+            user = entry["user"]
+            previous = changed[user] if user in changed else self.positions.get(user)
+            if previous is not None:
+                if not copied:
+                    self._ids_buffer, self._details_buffer = self._ids_buffer.copy(), self._details_buffer.copy()
+                    copied = True
+                dead.append(previous)
+                self._ids_buffer[previous] = self._details_buffer[previous] = None
+            if entry.get("deleted"):
+                changed[user] = None
+                continue
+            row = entry["offset"]
+            if row >= end:
+                self._reserve(row + 1)
+                # Rows skipped over hold templates in stores that kept them in the matrix file
+                dead.extend(range(end, row))
+                end = row + 1
+            self._ids_buffer[row], self._details_buffer[row] = user, entry["details"]
+            changed[user] = row
+
+        # Remapping is cheap, and the matrix stays a view of every row up to the last logged one
+        self._template_rows = self.store.templates_memmap()
+        if dead:
+            # Published before the rows' ids go, so a new snapshot never matches a dead row
+            self.dead_rows = np.concatenate([self.dead_rows, np.asarray(dead, dtype=np.int64)])
+        matrix = self.store.memmap()[:end] if end else np.empty((0, 0), dtype=np.float32)
+        self._snapshot = (matrix, self._ids_buffer[:end], self._details_buffer[:end])
+        for entry in entries:
+            self.templates.pop(entry["user"], None)
+            if entry.get("templates") and changed[entry["user"]] == entry.get("offset"):
+                self.templates[entry["user"]] = np.array(entry["templates"], dtype=np.int64)
+        for user, row in changed.items():
+            if row is None:
+                self.positions.pop(user, None)
+            else:
+                self.positions[user] = row
+        self._encode()
+        self.version += 1
+        if self.index is None:
+            return
+        if reset:
+            self.index.sync(*self.live_rows())
+            return
+        for user, row in changed.items():
+            if row is None:
+                self.index.remove(user)
+            else:
+                self.index.add(user, matrix[row])
+
+    def _reserve(self, rows):
+        if rows <= len(self._ids_buffer):
+            return
+        # Capacity doubles, so a stream of registrations costs amortized O(1) each
+        capacity = max(rows, 2 * len(self._ids_buffer), 1024)
+        for name in ("_ids_buffer", "_details_buffer"):
+            grown = np.empty(capacity, dtype=object)
+            old = getattr(self, name)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def _replace(self, users, vectors, details):
+        matrix = np.ascontiguousarray(normalize(vectors)) if len(vectors) else np.empty((0, 0), dtype=np.float32)
+        user_details = np.empty(len(details), dtype=object)
+        user_details[:] = details
+        self._snapshot = (matrix, np.array(users, dtype=object), user_details)
+        self.positions = {user: i for i, user in enumerate(users)}
+        self.codes = None
+        self._encode()
+        self.version += 1
+        if self.index is not None:
+            self.index.sync(users, self.matrix)
+
+    def _encode(self):
+        # Only rows past the end of the codes are new; dead store rows keep their stale codes and stay masked
+        if not self.quantize or not len(self.matrix):
+            self.codes = None
+        elif self.codes is None or len(self.matrix) > 2 * self.codes.fitted_rows:
+            self.codes = QuantizedCodes.encode(self.matrix, self.quantize)
+        elif len(self.matrix) > len(self.codes):
+            self.codes = self.codes.extend(self.matrix[len(self.codes):])
@@ -0,0 +1,92 @@
+import os
+import struct
+import tempfile
+import cv2
+import numpy as np
+
+
+# JPEG can decode straight to 1/2, 1/4 or 1/8 scale, which is much cheaper than a full decode plus resize
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def image_size(data: bytes):
+    """Reads (width, height) from a JPEG or PNG header without decoding, or None."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        # Start-of-frame markers, excluding DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def decode_image(data: bytes, max_side: int = 0):
+    """Decodes an uploaded image from memory into a BGR ndarray.
+
+    When max_side is set, the image is scaled down so its longer side is at
+    most max_side, using JPEG's reduced-resolution decode where possible.
+    Raises ValueError if the bytes are not a decodable image.
+    """
+    flags = cv2.IMREAD_COLOR
+    size = image_size(data) if max_side and data[:2] == b"\xff\xd8" else None
+    if size:
+        for factor, reduced in REDUCED_FLAGS:
+            if max(size) // factor >= max_side:
+                flags = reduced
+                break
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image is None:
+        raise ValueError("Uploaded file is not a valid image.")
+    return _fit(image, max_side)
+
+
+def _fit(image, max_side):
+    if max_side and max(image.shape[:2]) > max_side:
+        scale = max_side / max(image.shape[:2])
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return image
+
+
+def decode_clip(data: bytes, max_frames: int, max_side: int = 0):
+    """Decodes up to max_frames evenly spaced frames from an uploaded video clip.
+
+    OpenCV can only open videos by path, so the clip goes through a
+    temporary file. Raises ValueError if no frame can be read.
+    """
+    fd, path = tempfile.mkstemp(suffix=".clip")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        capture = cv2.VideoCapture(path)
+        try:
+            total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            wanted = set(np.linspace(0, total - 1, max_frames).astype(int)) if total > 0 else None
+            frames, frame_id = [], 0
+            while len(frames) < max_frames:
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                if wanted is None or frame_id in wanted:
+                    frames.append(_fit(frame, max_side))
+                frame_id += 1
+        finally:
+            capture.release()
+    finally:
+        os.remove(path)
+    if not frames:
+        raise ValueError("Uploaded file is not a readable video clip.")
+    return frames
@@ -0,0 +1,121 @@
+import asyncio
+import functools
+import time
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Match
+from metrics import REGISTRY, Gauge, Histogram
+
+
+STAGE_SECONDS = Histogram(
+    "recognition_stage_seconds", "Time spent in each stage of a recognition request.", labelnames=("stage",)
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", labelnames=("method", "route", "status")
+)
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests currently being served.")
+GALLERY_SIZE = Gauge("gallery_size", "Identities enrolled in the in-memory gallery.")
+MODEL_READY = Gauge("model_ready", "1 once the recognition model has been warmed up, else 0.")
+
+
+class StageTimer:
+    """Times a block or function into recognition_stage_seconds{stage=name}.
+
+    Costs two perf_counter() calls and one locked histogram update, cheap
+    enough to leave on in production.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.histogram = STAGE_SECONDS.labels(stage=name)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+    def __call__(self, fn):
+        histogram = self.histogram
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+        else:
+            @functools.wraps(fn)
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+        return timed
+
+
+def stage(name):
+    """Use as `with stage("decode"): ...` or as `@stage("match")` on a sync or async function."""
+    return StageTimer(name)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware recording latency and status per route template.
+
+    Routes are labelled by their template (e.g. /unregister/{name}), never the
+    raw path, so the number of series stays bounded; unknown paths share the
+    "unmatched" label.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def _route(self, scope):
+        for route in self.routes:
+            if route.matches(scope)[0] == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            REQUEST_SECONDS.labels(method=scope["method"], route=self._route(scope), status=status).observe(
+                time.perf_counter() - started
+            )
+
+
+def metrics_response():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+def instrument(app, gallery_size=None, model_ready=None):
+    """Adds request metrics and a /metrics endpoint to a FastAPI app.
+
+    `gallery_size` and `model_ready` are optional callables read whenever
+    /metrics is scraped.
+    """
+    app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+    app.add_api_route("/metrics", metrics_response, methods=["GET"], include_in_schema=False)
+    if gallery_size is not None:
+        GALLERY_SIZE.set_function(gallery_size)
+    if model_ready is not None:
+        MODEL_READY.set_function(model_ready)
+    return app
@@ -0,0 +1,186 @@
+from collections import namedtuple
+import numpy as np
+import config
+from gallery import normalize
+
+
+# Cosine distance thresholds per DeepFace model; a match needs similarity > 1 - threshold
+MODEL_THRESHOLDS = {
+    "VGG-Face": 0.40,
+    "Facenet": 0.40,
+    "Facenet512": 0.30,
+    "ArcFace": 0.68,
+    "Dlib": 0.07,
+    "SFace": 0.593,
+    "OpenFace": 0.10,
+    "DeepFace": 0.23,
+    "DeepID": 0.015,
+}
+DEFAULT_MODEL = config.MODEL_NAME
+RESCORE_CANDIDATES = config.RESCORE_CANDIDATES
+RERANK_CANDIDATES = config.RERANK_CANDIDATES
+
+Match = namedtuple("Match", ["user", "similarity", "details"])
+
+
+def threshold_for(model_name=DEFAULT_MODEL, threshold=None):
+    """Returns the cosine distance threshold to use for a model."""
+    if threshold is not None:
+        return threshold
+    return MODEL_THRESHOLDS.get(model_name, MODEL_THRESHOLDS["VGG-Face"])
+
+
+def match_embeddings(probes, gallery, top_k=1, threshold=None, model_name=DEFAULT_MODEL):
+    """Scores one probe or a batch of probes against the whole gallery.
+
+    All similarities come from a single matrix product, unless the gallery
+    has an approximate index attached, in which case only the index's
+    candidate lists are scanned, or quantized codes, in which case the
+    codes are scanned and the best RERANK_CANDIDATES re-ranked exactly. When some users were enrolled from several
+    samples, the best RESCORE_CANDIDATES centroid matches are re-scored
+    against each candidate's templates (best sample wins) before the
+    threshold is applied. Returns a list of at most top_k Matches (best
+    first) for a single probe, or one such list per row when probes is a
+    2-D batch.
+    """
+    single = np.ndim(probes) == 1
+    probes = normalize(np.atleast_2d(probes))
+    snapshot = gallery.snapshot()
+    if not len(snapshot[1]):
+        results = [[] for _ in range(len(probes))]
+        return results[0] if single else results
+
+    min_similarity = 1 - threshold_for(model_name, threshold)
+    if gallery.templates:
+        shortlists = _shortlist(probes, gallery, snapshot, max(top_k, RESCORE_CANDIDATES))
+        results = [_rescore(probe, shortlist, gallery, top_k, min_similarity)
+                   for probe, shortlist in zip(probes, shortlists)]
+        return results[0] if single else results
+    results = _shortlist(probes, gallery, snapshot, top_k, min_similarity)
+    return results[0] if single else results
+
+
+def _shortlist(probes, gallery, snapshot, top_k, min_similarity=-np.inf):
+    matrix, user_ids, details = snapshot
+    if gallery.index is not None and len(gallery.index):
+        return _match_index(probes, gallery, top_k, min_similarity)
+    codes = gallery.codes
+    if codes is not None and len(codes) == len(matrix):
+        return _rerank(probes, gallery, snapshot, codes, top_k, min_similarity)
+
+    scores = _mask_dead(probes @ matrix.T, gallery)
+    k = min(top_k, scores.shape[1])
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    candidates = np.take_along_axis(candidates, order, axis=1)
+    candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+    results = []
+    for row, row_scores in zip(candidates[:, :k], candidate_scores[:, :k]):
+        results.append([
+            Match(user_ids[i], float(score), details[i])
+            for i, score in zip(row, row_scores)
+            if score > min_similarity and user_ids[i] is not None
+        ])
+    return results
+
+
+def _mask_dead(scores, gallery):
+    # A store-backed gallery keeps superseded and deleted rows in its matrix; they must never match.
+    # The dead rows are read after the snapshot, so any beyond its end belong to a later one
+    dead = gallery.dead_rows
+    if len(dead):
+        scores[:, dead[dead < scores.shape[1]]] = -np.inf
+    return scores
+
+
+def _match_index(probes, gallery, top_k, min_similarity):
+    results = []
+    for ids, scores in zip(*gallery.index.search(probes, k=top_k)):
+        matches = []
+        for user, score in zip(ids, scores):
+            if score <= min_similarity:
+                continue
+            try:
+                matches.append(Match(user, float(score), gallery.details_for(user)))
+            except KeyError:
+                continue  # removed since the index was searched
+        results.append(matches)
+    return results
+
+
+def _rerank(probes, gallery, snapshot, codes, top_k, min_similarity):
+    matrix, user_ids, details = snapshot
+    approximate = _mask_dead(codes.scores(probes), gallery)
+    count = min(max(top_k, RERANK_CANDIDATES), approximate.shape[1])
+    if count < approximate.shape[1]:
+        candidates = np.argpartition(-approximate, count - 1, axis=1)[:, :count]
+    else:
+        candidates = np.broadcast_to(np.arange(approximate.shape[1]), approximate.shape)
+    results = []
+    for probe, rows, row_scores in zip(probes, candidates, approximate):
+        # Only the candidates' exact rows are read, so a memmapped matrix stays mostly cold
+        rows = np.sort(rows)
+        exact = matrix[rows] @ probe
+        exact[np.isneginf(row_scores[rows])] = -np.inf
+        order = np.argsort(-exact)[:top_k]
+        results.append([
+            Match(user_ids[rows[i]], float(exact[i]), details[rows[i]])
+            for i in order
+            if exact[i] > min_similarity and user_ids[rows[i]] is not None
+        ])
+    return results
+
+
+def _rescore(probe, candidates, gallery, top_k, min_similarity):
+    rescored = []
+    for match in candidates:
+        try:
+            similarity = float(np.max(gallery.templates_for(match.user) @ probe))
+        except KeyError:
+            continue  # removed since the shortlist was taken
+        rescored.append(match._replace(similarity=max(similarity, match.similarity)))
+    rescored.sort(key=lambda match: -match.similarity)
+    return [match for match in rescored[:top_k] if match.similarity > min_similarity]
+
+
+def best_match(probe, gallery, threshold=None, model_name=DEFAULT_MODEL):
+    """Returns the best Match for a single probe, or None below the threshold."""
+    matches = match_embeddings(probe, gallery, top_k=1, threshold=threshold, model_name=model_name)
+    return matches[0] if matches else None
+
+
+def bbox(face):
+    """Returns a representation's facial area as [x, y, w, h]."""
+    area = face.get("facial_area") or {}
+    return [int(area.get(key, 0)) for key in ("x", "y", "w", "h")]
+
+
+def recognize_faces(faces, gallery, max_faces=0, threshold=None, model_name=DEFAULT_MODEL):
+    """Matches every face detected in one frame against the gallery in a single batch.
+
+    `faces` is one image's DeepFace.represent / represent_batch output. When
+    `max_faces` > 0 only that many faces are kept, largest first. Returns a
+    list of {bbox, identity, score}; identity and score are None for faces
+    with no match above the threshold. Faces the quality gate rejected keep
+    their reason under "quality".
+    """
+    if max_faces > 0 and len(faces) > max_faces:
+        faces = sorted(faces, key=lambda face: -bbox(face)[2] * bbox(face)[3])[:max_faces]
+    results = [{"bbox": bbox(face), "identity": None, "score": None} for face in faces]
+    usable = [i for i, face in enumerate(faces) if face.get("embedding") is not None]
+    for i, face in enumerate(faces):
+        if face.get("quality"):
+            results[i]["quality"] = face["quality"]
+    if not usable:
+        return results
+    probes = np.asarray([faces[i]["embedding"] for i in usable], dtype=np.float32)
+    matches = match_embeddings(probes, gallery, top_k=1, threshold=threshold, model_name=model_name)
+    for i, match in zip(usable, matches):
+        if match:
+            results[i].update(identity=match[0].user, score=match[0].similarity)
+    return results
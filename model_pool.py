@@ -0,0 +1,161 @@
+import threading
+import cv2
+import numpy as np
+from deepface import DeepFace
+import config
+from cascade_detector import detector_from_config
+from instrumentation import stage
+from quality import gate_from_config
+
+
+class ModelPool:
+    """Builds the recognition model and face detector once and keeps them warm.
+
+    DeepFace caches built models per name, so routing every embedding call
+    through represent() with the same model and detector reuses the objects
+    built during warm_up() instead of paying for them on the first request.
+    detector_backend "cascade" detects with cascade_detector.CascadeDetector.
+    """
+
+    def __init__(self, model_name=config.MODEL_NAME, detector_backend=config.DETECTOR_BACKEND):
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.model = None
+        self.cascade = detector_from_config() if detector_backend == "cascade" else None
+        self.quality_gate = gate_from_config()
+        self.ready = False
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Builds the model and runs one inference on a synthetic image."""
+        if self.ready:
+            return self
+        with self._lock:
+            if self.ready:
+                return self
+            self.model = DeepFace.build_model(self.model_name)
+            synthetic = np.random.default_rng(0).integers(0, 255, size=(224, 224, 3), dtype=np.uint8)
+            DeepFace.represent(
+                synthetic,
+                model_name=self.model_name,
+                detector_backend=config.CASCADE_DETECTOR if self.cascade else self.detector_backend,
+                enforce_detection=False,
+            )
+            self.ready = True
+        print(f"Model {self.model_name} with {self.detector_backend} detector is warm.")
+        return self
+
+    def start_warm_up(self):
+        """Warms up in a background thread so the server can answer readiness probes."""
+        threading.Thread(target=self.warm_up, daemon=True).start()
+
+    def represent(self, img, detector_backend=None):
+        """Returns DeepFace representations for an image path or array.
+
+        Pass detector_backend="skip" for crops that are already a detected face.
+        """
+        if (detector_backend or self.detector_backend) == "cascade":
+            return self.represent_batch([img])[0]
+        self.warm_up()
+        with stage("represent"):
+            return DeepFace.represent(
+                img,
+                model_name=self.model_name,
+                detector_backend=detector_backend or self.detector_backend,
+                enforce_detection=False,
+            )
+
+    def represent_batch(self, images, detector_backend=None, check_quality=False):
+        """Embeds every face in a list of images with one batched forward pass.
+
+        Detection still runs per image; the aligned crops are then stacked
+        and pushed through the model together. Returns one list per image in
+        the same shape as DeepFace.represent. Pass detector_backend="skip"
+        for crops that are already a detected face.
+
+        With check_quality, faces failing the quality gate (see quality.py)
+        skip the forward pass and come back with "embedding": None and the
+        rejection reason under "quality".
+        """
+        self.warm_up()
+        backend = detector_backend or self.detector_backend
+        gate = self.quality_gate if check_quality else None
+        results = [[] for _ in images]
+        crops, accepted = [], []
+        with stage("detect"):
+            for i, img in enumerate(images):
+                for face in self._extract_faces(img, backend):
+                    entry = {
+                        "embedding": None,
+                        "facial_area": face["facial_area"],
+                        "face_confidence": face.get("confidence"),
+                    }
+                    results[i].append(entry)
+                    if gate is not None:
+                        with stage("quality"):
+                            # A skipped detector reports no confidence worth checking
+                            confidence = entry["face_confidence"] if backend != "skip" else None
+                            reason = gate.check(face["face"], face["facial_area"], confidence)
+                        if reason is not None:
+                            entry["quality"] = reason
+                            continue
+                    crops.append(self._fit(face["face"]))
+                    accepted.append(entry)
+
+        if not crops:
+            return results
+        with stage("forward"):
+            embeddings = self._forward(np.stack(crops))
+        for entry, embedding in zip(accepted, embeddings):
+            entry["embedding"] = embedding.tolist()
+        return results
+
+    def _extract_faces(self, img, backend):
+        if backend == "cascade":
+            return self.cascade.extract_faces(img)
+        return DeepFace.extract_faces(img, detector_backend=backend, enforce_detection=False, align=True)
+
+    def _input_size(self):
+        shape = tuple(self.model.input_shape)
+        return shape[1:3] if len(shape) == 4 else shape[:2]
+
+    def _fit(self, face):
+        # Same aspect-preserving resize and zero padding DeepFace applies;
+        # extract_faces hands back RGB while represent feeds the model BGR
+        height, width = self._input_size()
+        face = np.asarray(face, dtype=np.float32)
+        if face.ndim == 4:
+            face = face[0]
+        face = np.ascontiguousarray(face[:, :, ::-1])
+        factor = min(height / face.shape[0], width / face.shape[1])
+        resized = cv2.resize(face, (max(1, int(face.shape[1] * factor)), max(1, int(face.shape[0] * factor))))
+        padded = np.zeros((height, width, 3), dtype=np.float32)
+        top, left = (height - resized.shape[0]) // 2, (width - resized.shape[1]) // 2
+        padded[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+        return padded
+
+    def _forward(self, batch):
+        # Newer DeepFace wraps the Keras model in a client exposing .model
+        keras_model = getattr(self.model, "model", self.model)
+        return np.asarray(keras_model.predict(batch, verbose=0), dtype=np.float32)
+
+
+model_pool = ModelPool()
+
+
+# Module-level entry points, picklable for process-pool executors; each
+# worker process warms up and uses its own model_pool
+def warm_up_worker():
+    model_pool.warm_up()
+
+
+def represent(img):
+    return model_pool.represent(img)
+
+
+def represent_batch(images):
+    return model_pool.represent_batch(images)
+
+
+def represent_gated(images):
+    return model_pool.represent_batch(images, check_quality=True)
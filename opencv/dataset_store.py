@@ -0,0 +1,135 @@
+import json
+import os
+import pickle
+import threading
+import uuid
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process enrollment only
+    fcntl = None
+
+
+class DatasetStore:
+    """Append-only store of enrolled face samples for the Haar + KNN scripts.
+
+    Every enrollment is written as its own `chunks/<id>.npy` file and then
+    recorded as one line ({"name", "file", "rows"}) in `manifest.jsonl`, so
+    enrolling costs only as much as the new samples and never rewrites
+    earlier ones. The manifest line is appended under an exclusive file lock
+    after the chunk is fully on disk, so concurrent enrollments cannot
+    corrupt each other and readers never see a half-written chunk.
+    """
+
+    MANIFEST_FILE = "manifest.jsonl"
+    CHUNK_FOLDER = "chunks"
+    LOCK_FILE = "dataset.lock"
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.manifest_path = os.path.join(folder, self.MANIFEST_FILE)
+        self.chunk_folder = os.path.join(folder, self.CHUNK_FOLDER)
+        self.lock_path = os.path.join(folder, self.LOCK_FILE)
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, name, samples):
+        """Stores one person's flattened face samples as a new chunk."""
+        entry = self._write_chunk(name, samples)
+        with self._exclusive():
+            self._write_manifest([entry])
+        return entry["file"]
+
+    def _write_chunk(self, name, samples):
+        samples = np.asarray(samples)
+        samples = samples.reshape(len(samples), -1)
+        os.makedirs(self.chunk_folder, exist_ok=True)
+        file_name = f"{uuid.uuid4().hex}.npy"
+        temp_path = os.path.join(self.chunk_folder, file_name + ".tmp")
+        with open(temp_path, "wb") as f:
+            np.save(f, samples)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, os.path.join(self.chunk_folder, file_name))
+        return {"name": name, "file": file_name, "rows": len(samples)}
+
+    def _write_manifest(self, entries):
+        with open(self.manifest_path, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+    def entries(self):
+        """Returns the manifest entries, oldest first."""
+        if not self.exists():
+            return []
+        with open(self.manifest_path, "r") as f:
+            # A line without its newline is still being written
+            return [json.loads(line) for line in f if line.endswith("\n") and line.strip()]
+
+    def chunks(self, entries=None):
+        """Yields (name, samples) per chunk, memory-mapped rather than read into memory.
+
+        `entries` pins the chunks to an earlier entries() snapshot.
+        """
+        for entry in self.entries() if entries is None else entries:
+            yield entry["name"], np.load(os.path.join(self.chunk_folder, entry["file"]), mmap_mode="r")
+
+    def labels(self):
+        """Returns one name per stored sample, without touching the chunks."""
+        return [entry["name"] for entry in self.entries() for _ in range(entry["rows"])]
+
+    def load(self, entries=None):
+        """Returns (faces, labels) with every chunk (or those in `entries`) concatenated into one matrix."""
+        names, arrays = [], []
+        for name, samples in self.chunks(entries):
+            names.extend([name] * len(samples))
+            arrays.append(samples)
+        if not arrays:
+            return np.empty((0, 0), dtype=np.uint8), names
+        return np.concatenate(arrays), names
+
+
+def import_pickles(folder, store):
+    """Copies the old names.pkl / faces_data.pkl pair into the store, one chunk per person.
+
+    Callers hold the store's lock; see open_dataset().
+    """
+    names_path = os.path.join(folder, "names.pkl")
+    faces_path = os.path.join(folder, "faces_data.pkl")
+    entries = []
+    if os.path.exists(names_path) and os.path.exists(faces_path):
+        with open(names_path, "rb") as f:
+            names = np.asarray(pickle.load(f))
+        with open(faces_path, "rb") as f:
+            faces = np.asarray(pickle.load(f))
+        entries = [store._write_chunk(str(name), faces[names == name]) for name in dict.fromkeys(names)]
+    # Written even when empty, which marks the import as done
+    store._write_manifest(entries)
+    return sum(entry["rows"] for entry in entries)
+
+
+def open_dataset(folder="data"):
+    """Opens the dataset store under `folder`, importing the old pickles the first time."""
+    store = DatasetStore(os.path.join(folder, "dataset"))
+    if not store.exists():
+        os.makedirs(store.folder, exist_ok=True)
+        with store._exclusive():
+            if not store.exists():
+                import_pickles(folder, store)
+    return store
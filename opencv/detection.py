@@ -0,0 +1,175 @@
+import argparse
+import glob
+import os
+import time
+import cv2
+
+
+CASCADE_PATH = "data/haarcascade_frontalface_default.xml"
+
+
+class DetectionEngine:
+    """Haar face detection with cheaper modes for live capture loops.
+
+    - `downscale` < 1 runs the cascade on a shrunk copy of the frame and
+      maps the boxes back to full resolution.
+    - `detect_every` N runs a full-frame detection only every Nth frame.
+    - `roi_margin` > 0 searches, on the frames in between, only a window
+      around each previous box (grown by that fraction of its size); if any
+      face is lost there, the frame falls back to a full detection. With
+      roi_margin 0 the previous boxes are simply reused.
+
+    detect() takes a greyscale frame and returns (x, y, w, h) tuples.
+    """
+
+    def __init__(self, cascade, scale_factor=1.3, min_neighbors=2, downscale=1.0, detect_every=1, roi_margin=0.0):
+        self.cascade = cascade
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.downscale = downscale
+        self.detect_every = max(1, detect_every)
+        self.roi_margin = roi_margin
+        self.frame_id = 0
+        self.boxes = []
+        self.full_detections = 0
+
+    def _cascade(self, grey, scale=1.0):
+        if scale != 1.0:
+            grey = cv2.resize(grey, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        boxes = self.cascade.detectMultiScale(grey, self.scale_factor, self.min_neighbors)
+        return [tuple(int(round(v / scale)) for v in box) for box in boxes]
+
+    def _full(self, grey):
+        self.full_detections += 1
+        return self._cascade(grey, self.downscale)
+
+    def _search_rois(self, grey):
+        height, width = grey.shape[:2]
+        found = []
+        for x, y, w, h in self.boxes:
+            dx, dy = int(w * self.roi_margin), int(h * self.roi_margin)
+            x0, y0 = max(0, x - dx), max(0, y - dy)
+            x1, y1 = min(width, x + w + dx), min(height, y + h + dy)
+            boxes = self._cascade(grey[y0:y1, x0:x1], self.downscale)
+            if not boxes:
+                return None
+            # Keep the largest hit in the window; it is the face we were following
+            bx, by, bw, bh = max(boxes, key=lambda box: box[2] * box[3])
+            found.append((bx + x0, by + y0, bw, bh))
+        return found
+
+    def detect(self, grey):
+        full = self.frame_id % self.detect_every == 0 or not self.boxes
+        self.frame_id += 1
+        if full:
+            self.boxes = self._full(grey)
+        elif self.roi_margin > 0:
+            boxes = self._search_rois(grey)
+            self.boxes = boxes if boxes is not None else self._full(grey)
+        return list(self.boxes)
+
+
+def engine_from_env(cascade):
+    """Builds the engine used by main.py and test.py from FACE_DETECT_* environment variables.
+
+    The defaults detect every frame at full resolution. The speed modes miss
+    small and fast-moving faces, so turn them on only after `python
+    detection.py` shows acceptable recall on your own footage, e.g.
+    FACE_DETECT_DOWNSCALE=0.5, FACE_DETECT_EVERY=3, FACE_DETECT_ROI_MARGIN=0.5.
+    """
+    return DetectionEngine(
+        cascade,
+        downscale=float(os.getenv("FACE_DETECT_DOWNSCALE", "1.0")),
+        detect_every=int(os.getenv("FACE_DETECT_EVERY", "1")),
+        roi_margin=float(os.getenv("FACE_DETECT_ROI_MARGIN", "0")),
+    )
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    iw = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    ih = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    intersection = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union else 0.0
+
+
+def recall(detections, reference, iou_threshold=0.5):
+    """Share of reference boxes matched by a detection with IoU >= iou_threshold, frame by frame."""
+    expected = sum(len(wanted) for wanted in reference)
+    matched = sum(
+        1
+        for found, wanted in zip(detections, reference)
+        for box in wanted
+        if any(iou(box, other) >= iou_threshold for other in found)
+    )
+    return matched / expected if expected else 1.0
+
+
+def read_frames(source, limit=0, grey=True):
+    """Loads frames from a video file or a folder of images, as greyscale unless grey=False (BGR)."""
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*")) if p.lower().endswith((".jpg", ".jpeg", ".png")))
+        flags = cv2.IMREAD_GRAYSCALE if grey else cv2.IMREAD_COLOR
+        frames = [cv2.imread(path, flags) for path in paths[:limit or None]]
+        return [frame for frame in frames if frame is not None]
+    video = cv2.VideoCapture(source)
+    frames = []
+    while not limit or len(frames) < limit:
+        ret, frame = video.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if grey else frame)
+    video.release()
+    return frames
+
+
+def benchmark(frames, engine, reference, iou_threshold=0.5):
+    """Runs engine over frames and scores it against reference boxes from full-frame detection.
+
+    Returns (fps, recall, full detections); recall is the share of reference
+    boxes matched by an engine box with IoU >= iou_threshold.
+    """
+    started = time.perf_counter()
+    detections = [engine.detect(frame) for frame in frames]
+    seconds = time.perf_counter() - started
+    return len(frames) / seconds, recall(detections, reference, iou_threshold), engine.full_detections
+
+
+def main():
+    """Compares detection modes against full-frame detection on recorded frames."""
+    parser = argparse.ArgumentParser(description="Benchmark Haar detection modes on recorded frames.")
+    parser.add_argument("source", help="Video file or folder of frames")
+    parser.add_argument("--cascade", default=CASCADE_PATH)
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many frames")
+    parser.add_argument("--downscale", type=float, default=0.5)
+    parser.add_argument("--detect-every", type=int, default=3)
+    parser.add_argument("--roi-margin", type=float, default=0.5)
+    args = parser.parse_args()
+
+    frames = read_frames(args.source, args.limit)
+    if not frames:
+        raise SystemExit(f"No frames could be read from {args.source}")
+    cascade = cv2.CascadeClassifier(args.cascade)
+
+    baseline = DetectionEngine(cascade)
+    started = time.perf_counter()
+    reference = [baseline.detect(frame) for frame in frames]
+    baseline_fps = len(frames) / (time.perf_counter() - started)
+
+    modes = [
+        ("downscale", dict(downscale=args.downscale)),
+        ("every-n", dict(detect_every=args.detect_every)),
+        ("every-n + roi", dict(detect_every=args.detect_every, roi_margin=args.roi_margin)),
+        ("combined", dict(downscale=args.downscale, detect_every=args.detect_every, roi_margin=args.roi_margin)),
+    ]
+    print(f"{len(frames)} frames, {sum(len(boxes) for boxes in reference)} reference faces")
+    print(f"{'mode':<16}{'fps':>10}{'speedup':>10}{'recall':>10}{'full':>8}")
+    print(f"{'full-frame':<16}{baseline_fps:>10.1f}{1.0:>10.2f}{1.0:>10.3f}{len(frames):>8}")
+    for name, options in modes:
+        fps, recall, full = benchmark(frames, DetectionEngine(cascade, **options), reference)
+        print(f"{name:<16}{fps:>10.1f}{fps / baseline_fps:>10.2f}{recall:>10.3f}{full:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import pickle
+from sklearn.decomposition import PCA
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+
+
+MODEL_FILE = "knn_model.pkl"
+
+
+def fit_model(faces, labels, n_components=50, n_neighbors=5):
+    """Fits PCA down to n_components, then a KNN classifier on the reduced samples.
+
+    KNN over 50 PCA components instead of 7500 raw pixels makes every
+    neighbour search ~150x cheaper and lets scikit-learn use a tree index.
+    """
+    n_components = min(n_components, len(faces), len(faces[0]))
+    model = make_pipeline(
+        PCA(n_components=n_components, svd_solver="randomized", random_state=0),
+        KNeighborsClassifier(n_neighbors=min(n_neighbors, len(faces))),
+    )
+    return model.fit(faces, labels)
+
+
+def save_model(model, chunks, folder="data"):
+    """Persists a fitted model along with the dataset version (chunk count) it was fitted on."""
+    path = os.path.join(folder, MODEL_FILE)
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump({"model": model, "chunks": chunks}, f)
+    os.replace(path + ".tmp", path)
+
+
+def refit(store, folder="data"):
+    """Refits the model on the whole dataset and saves it; called after each enrollment."""
+    # Chunks enrolled while fitting are not in this model, so it is tagged with what it was fitted on
+    entries = store.entries()
+    faces, labels = store.load(entries)
+    model = fit_model(faces, labels)
+    save_model(model, len(entries), folder)
+    return model
+
+
+def load_model(store, folder="data"):
+    """Loads the prefit model, refitting only if the dataset changed since it was saved."""
+    path = os.path.join(folder, MODEL_FILE)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+        if saved["chunks"] == len(store.entries()):
+            return saved["model"]
+    return refit(store, folder)
@@ -1,14 +1,15 @@
 import cv2  # OpenCV library for image processing
-import pickle  # For saving and loading data
 import numpy as np  # For numerical operations
-import os  # For file and directory handling
+from dataset_store import open_dataset  # Append-only storage for the captured face samples
+from detection import engine_from_env  # Downscaled, frame-skipping Haar detection
+from knn_model import refit  # PCA + KNN model that test.py loads prefit
 
 
 # Initialize the webcam (0 is the default webcam, 1 for an external webcam if connected)
 video = cv2.VideoCapture(0)
 
-# Load the pre-trained Haar cascade classifier for face detection
-face_detect = cv2.CascadeClassifier("data/haarcascade_frontalface_default.xml")
+# Load the pre-trained Haar cascade classifier for face detection (see detection.py for the FACE_DETECT_* options)
+face_detect = engine_from_env(cv2.CascadeClassifier("data/haarcascade_frontalface_default.xml"))
 
 # List to store face data and a counter variable
 faces_data = []
@@ -26,7 +27,7 @@ while True:
     grey_scale = cv2.cvtColor(attendance_frame, cv2.COLOR_BGR2GRAY)
     
     # Detect faces in the grayscale frame
-    faces = face_detect.detectMultiScale(grey_scale, 1.3, 2)
+    faces = face_detect.detect(grey_scale)
     
     # Loop through all detected faces
     for (x, y, w, h) in faces:
@@ -61,34 +62,14 @@ while True:
 video.release()
 cv2.destroyAllWindows()
 
-# Convert the list of face data to a NumPy array and reshape it for storage
+# Convert the list of face data to a NumPy array with one flattened sample per row
 faces_data = np.asarray(faces_data)
-faces_data = faces_data.reshape(100, -1)
+faces_data = faces_data.reshape(len(faces_data), -1)
 
-# Save or update the names data in 'data/names.pkl'
-if 'names.pkl' not in os.listdir('data/'):  # Check if the names file exists
-    # If not, create a new names file with the entered name repeated 100 times
-    names = [name] * 100
-    with open('data/names.pkl', 'wb') as file:
-        pickle.dump(names, file)
-else:
-    # If the file exists, load the existing names, append the new name, and save it back
-    with open('data/names.pkl', 'rb') as file:
-        names = pickle.load(file)
-    names = names + [name] * 100
-    with open('data/names.pkl', 'wb') as file:
-        pickle.dump(names, file)
-
-# Save or update the face data in 'data/faces_data.pkl'
-if 'faces_data.pkl' not in os.listdir('data/'):  # Check if the face data file exists
-    # If not, create a new file to save the captured face data
-    with open('data/faces_data.pkl', 'wb') as file:
-        pickle.dump(faces_data, file)
-else:
-    # If the file exists, load the existing data, append the new data, and save it back
-    with open('data/faces_data.pkl', 'rb') as file:
-        faces = pickle.load(file)
-    faces = np.append(faces, faces_data, axis=0)
-    with open('data/faces_data.pkl', 'wb') as file:
-        pickle.dump(faces, file)
+# Append the samples as a new chunk of the dataset store; earlier enrollments are never rewritten
+if len(faces_data):
+    dataset = open_dataset("data")
+    dataset.append(name, faces_data)
 
+    # Refit the recognition model now, so the attendance loop starts without fitting anything
+    refit(dataset, "data")
@@ -1,35 +1,31 @@
-from sklearn.neighbors import KNeighborsClassifier
 import cv2
-import pickle
 import numpy as np
 import os
+from dataset_store import open_dataset
+from detection import engine_from_env
+from knn_model import load_model
 # 
 from datetime import datetime, time
 
 video = cv2.VideoCapture(0)
-face_detect = cv2.CascadeClassifier("data/haarcascade_frontalface_default.xml")
+face_detect = engine_from_env(cv2.CascadeClassifier("data/haarcascade_frontalface_default.xml"))
 faces_data = []
 
-with open('data/names.pkl', 'rb') as f:
-    LABELS = pickle.load(f)
-
-with open('data/faces_data.pkl', 'rb') as f:
-     FACES = pickle.load(f)
-
-
-KNN = KNeighborsClassifier(n_neighbors=5)
-KNN.fit(FACES, LABELS)
+# Load the PCA + KNN model fitted at enrollment; it is only refitted if the dataset changed since
+MODEL = load_model(open_dataset('data'), 'data')
 
 COL_NAMES = ["Name","Time"]
 
 while True:
     ret, attendance_frame = video.read()
     grey_scale = cv2.cvtColor(attendance_frame, cv2.COLOR_BGR2GRAY)
-    faces = face_detect.detectMultiScale(grey_scale, 1.3, 2)
-    for (x, y, w, h) in faces:
-        cropped_img = attendance_frame[y: y + h, x: x + w : ]
-        resized_img = cv2.resize(cropped_img, (50, 50)).flatten().reshape(1,-1)
-        output = KNN.predict(resized_img)
+    faces = face_detect.detect(grey_scale)
+
+    # Predict every face in the frame with a single call
+    crops = [cv2.resize(attendance_frame[y: y + h, x: x + w : ], (50, 50)).flatten() for (x, y, w, h) in faces]
+    predictions = MODEL.predict(np.stack(crops)) if crops else []
+    for (x, y, w, h), prediction in zip(faces, predictions):
+        output = [prediction]
 
         ts = time.time()
         record_date = datetime.fromtimestamp(ts).strftime("%d-%m-%Y")
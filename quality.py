@@ -0,0 +1,124 @@
+import math
+import cv2
+import numpy as np
+import config
+from metrics import Counter
+
+
+QUALITY_REJECTIONS = Counter(
+    "face_quality_rejections_total", "Detected faces rejected before embedding, by reason.", labelnames=("reason",)
+)
+
+# Side of the greyscale thumbnail the blur and exposure checks run on, which keeps them
+# independent of the crop's resolution and well under a millisecond
+THUMBNAIL_SIDE = 64
+
+
+def _grey_thumbnail(face):
+    face = np.asarray(face)
+    if face.ndim == 4:
+        face = face[0]
+    # Shrink first so the conversions below only touch THUMBNAIL_SIDE² pixels. Nearest-neighbour
+    # sampling to twice the size, then an exact 2:1 area average, costs a fraction of a direct
+    # INTER_AREA resize and keeps Laplacian variance close to it for the blur levels that matter
+    side = 2 * THUMBNAIL_SIDE
+    face = cv2.resize(face, (side, side), interpolation=cv2.INTER_NEAREST)
+    if face.dtype == np.float64:
+        face = face.astype(np.float32)
+    face = cv2.resize(face, (THUMBNAIL_SIDE, THUMBNAIL_SIDE), interpolation=cv2.INTER_AREA)
+    if face.ndim == 3:
+        face = cv2.cvtColor(face, cv2.COLOR_RGB2GRAY)
+    if face.dtype != np.uint8:
+        # DeepFace.extract_faces hands back RGB floats in [0, 1]
+        face = np.clip(face * 255 if face.max() <= 1.0 else face, 0, 255).astype(np.uint8)
+    return face
+
+
+def pose(facial_area):
+    """Rough (yaw, roll) in degrees from the eye landmarks of a facial area, or None without them.
+
+    Roll is the tilt of the line between the eyes. Yaw is estimated from how
+    far the eyes' midpoint sits from the centre of the box: a head turned
+    by angle a moves it by about half the box width times sin(a).
+    """
+    left, right = facial_area.get("left_eye"), facial_area.get("right_eye")
+    width = facial_area.get("w") or 0
+    if not left or not right or not width:
+        return None
+    dx, dy = right[0] - left[0], right[1] - left[1]
+    roll = math.degrees(math.atan2(dy, dx))
+    roll = roll - 180 if roll > 90 else roll + 180 if roll < -90 else roll
+    offset = ((left[0] + right[0]) / 2 - (facial_area["x"] + width / 2)) / (width / 2)
+    yaw = math.degrees(math.asin(max(-1.0, min(1.0, offset))))
+    return yaw, roll
+
+
+class QualityGate:
+    """Cheap checks on a detected face that decide whether it is worth embedding.
+
+    check() returns None for a usable face or one of these reasons:
+    "no_face" (the detector found nothing and handed back the whole frame),
+    "too_small", "blurry" (variance of the Laplacian), "too_dark",
+    "overexposed" and "pose" (yaw or roll beyond the limits, only when the
+    detector provides eye landmarks). Every rejection is counted in
+    face_quality_rejections_total{reason}.
+    """
+
+    def __init__(
+        self,
+        min_size=48,
+        min_sharpness=25.0,
+        min_brightness=40.0,
+        max_brightness=215.0,
+        max_yaw=40.0,
+        max_roll=30.0,
+    ):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_yaw = max_yaw
+        self.max_roll = max_roll
+
+    def check(self, face, facial_area=None, confidence=None):
+        """Returns the rejection reason for a face crop, or None if it passes.
+
+        `confidence` is the detector's; pass None when detection was skipped.
+        """
+        reason = self._reason(face, facial_area or {}, confidence)
+        if reason is not None:
+            QUALITY_REJECTIONS.labels(reason=reason).inc()
+        return reason
+
+    def _reason(self, face, facial_area, confidence):
+        if confidence is not None and confidence <= 0:
+            return "no_face"
+        size = min(facial_area.get("w") or 0, facial_area.get("h") or 0) or min(np.shape(face)[-3:-1])
+        if size < self.min_size:
+            return "too_small"
+        thumbnail = _grey_thumbnail(face)
+        brightness = float(thumbnail.mean())
+        if brightness < self.min_brightness:
+            return "too_dark"
+        if brightness > self.max_brightness:
+            return "overexposed"
+        if cv2.Laplacian(thumbnail, cv2.CV_32F).var() < self.min_sharpness:
+            return "blurry"
+        angles = pose(facial_area)
+        if angles is not None and (abs(angles[0]) > self.max_yaw or abs(angles[1]) > self.max_roll):
+            return "pose"
+        return None
+
+
+def gate_from_config():
+    """The gate configured by FACE_QUALITY_* environment variables, or None when it is switched off."""
+    if not config.QUALITY_GATE:
+        return None
+    return QualityGate(
+        config.QUALITY_MIN_SIZE,
+        config.QUALITY_MIN_SHARPNESS,
+        config.QUALITY_MIN_BRIGHTNESS,
+        config.QUALITY_MAX_BRIGHTNESS,
+        config.QUALITY_MAX_YAW,
+        config.QUALITY_MAX_ROLL,
+    )
@@ -0,0 +1,106 @@
+import numpy as np
+
+
+QUANTIZE_KINDS = ("float16", "int8")
+
+
+def _quantize(matrix, scale):
+    if scale is None:
+        return matrix.astype(np.float16)
+    return np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+
+
+class QuantizedCodes:
+    """Compact copy of a normalized gallery matrix for the coarse scan.
+
+    `float16` halves the float32 matrix; `int8` quarters it, storing each
+    dimension as round(x / scale) with a per-dimension scale chosen so the
+    largest value in that dimension maps to 127. scores() approximates
+    probes @ matrix.T from the codes alone; callers re-rank the best
+    candidates against the exact float32 rows (see matcher.py).
+
+    The scan converts codes back to float32 block by block, so it trades
+    memory for CPU: int8 scans about as fast as the float32 product, while
+    numpy's float16 conversion makes that mode several times slower.
+
+    Rows added later are encoded with the existing scale (see extend()), so
+    a growing gallery is never re-quantized as a whole; `fitted_rows` is the
+    number of rows the scale was fitted on, for callers deciding when to
+    refit.
+    """
+
+    # Rows converted to float32 at a time; small enough that each block stays
+    # in cache between the conversion and the product
+    BLOCK_ROWS = 1024
+
+    def __init__(self, codes, scale=None):
+        self.codes = codes
+        self.scale = scale
+        self.fitted_rows = len(codes)
+        self._spare = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    @classmethod
+    def encode(cls, matrix, kind="int8"):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if kind == "float16":
+            return cls(_quantize(matrix, None))
+        if kind != "int8":
+            raise ValueError(f"Unknown quantization: {kind}")
+        scale = np.abs(matrix).max(axis=0) / 127
+        scale[scale == 0] = 1.0
+        scale = scale.astype(np.float32)
+        return cls(_quantize(matrix, scale), scale)
+
+    def extend(self, rows):
+        """Returns codes with `rows` appended, encoded with the existing scale.
+
+        The new codes share a buffer with spare capacity, so appending one
+        row at a time costs amortized O(1); this object keeps its own rows
+        and stays valid for readers still holding it. int8 values beyond
+        the fitted range are clipped.
+        """
+        new = _quantize(np.atleast_2d(np.asarray(rows, dtype=np.float32)), self.scale)
+        count, total = len(self.codes), len(self.codes) + len(new)
+        spare = self._spare
+        if spare is None or total > len(spare):
+            spare = np.empty((max(total, 2 * count), new.shape[1]), dtype=new.dtype)
+            spare[:count] = self.codes
+        spare[count:total] = new
+        extended = QuantizedCodes(spare[:total], self.scale)
+        extended.fitted_rows, extended._spare = self.fitted_rows, spare
+        return extended
+
+    def replace(self, row, vector):
+        """Returns codes with `row` re-encoded with the existing scale; this object is left as it was."""
+        replaced = QuantizedCodes(self.codes.copy(), self.scale)
+        replaced.fitted_rows = self.fitted_rows
+        replaced.codes[row] = _quantize(np.atleast_2d(np.asarray(vector, dtype=np.float32)), self.scale)[0]
+        return replaced
+
+    def delete(self, row):
+        """Returns codes without `row`."""
+        deleted = QuantizedCodes(np.delete(self.codes, row, axis=0), self.scale)
+        deleted.fitted_rows = self.fitted_rows
+        return deleted
+
+    def decode(self, rows=slice(None)):
+        decoded = self.codes[rows].astype(np.float32)
+        return decoded * self.scale if self.scale is not None else decoded
+
+    def scores(self, probes):
+        """Approximate similarities of each probe against every encoded row."""
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+        # Folding the int8 scale into the probe keeps the scan to one product per block
+        weighted = probes * self.scale if self.scale is not None else probes
+        scores = np.empty((len(probes), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), self.BLOCK_ROWS):
+            block = self.codes[start:start + self.BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = weighted @ block.T
+        return scores
@@ -1,11 +1,30 @@
-from fastapi import FastAPI, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import hashlib
+import io
 import os
 import json
+import shutil
+import zipfile
 from datetime import datetime
-from deepface import DeepFace
-from scipy.spatial.distance import cosine
+from typing import List
 import uvicorn
+import config
+from ann_index import IVFIndex
+from batcher import MicroBatcher
+from bulk_enroll import PhotoSource, enroll, read_manifest
+from embedding_store import open_store
+from executor import InferenceExecutor
+from gallery import EmbeddingGallery, user_folder
+from imaging import decode_clip, decode_image
+from instrumentation import instrument, stage
+from matcher import best_match, recognize_faces
+from model_pool import represent_batch, represent_gated, warm_up_worker
+from result_cache import ResultCache, content_key, dhash
+from streaming import serve_stream
  
 app = FastAPI()
  
@@ -21,86 +40,305 @@ app.add_middleware(
     allow_headers=["*"],
 )
  
-BASE_FOLDER = "FaceRecords"
+BASE_FOLDER = config.BASE_FOLDER
 os.makedirs(BASE_FOLDER, exist_ok=True)
+
+# Process-wide gallery, loaded once at startup and updated on registration
+gallery = EmbeddingGallery(
+    BASE_FOLDER, store=open_store(config.EMBEDDING_STORE, BASE_FOLDER), quantize=config.GALLERY_QUANTIZE
+)
+
+
+@app.on_event("startup")
+def load_gallery():
+    with stage("gallery_load"):
+        gallery.load()
+    if config.ANN_INDEX_PATH and os.path.exists(config.ANN_INDEX_PATH):
+        gallery.attach_index(IVFIndex.load(config.ANN_INDEX_PATH))
+        gallery.index.nprobe = config.ANN_NPROBE
+    train_index()
+
+
+def train_index():
+    """Trains and attaches the approximate index once the gallery reaches ANN_MIN_SIZE users.
+
+    Until then matching stays exact; a gallery that starts empty or small
+    gets its index from the first registration or refresh that takes it
+    over the threshold.
+    """
+    if not config.ANN_INDEX_PATH or gallery.index is not None or len(gallery) < config.ANN_MIN_SIZE:
+        return
+    with stage("ann_train"):
+        index = IVFIndex(nlist=config.ANN_NLIST, nprobe=config.ANN_NPROBE).train(gallery.live_rows()[1])
+        gallery.attach_index(index)
+
+
+# CPU-bound inference runs on a bounded pool whose workers each warm up the model;
+# concurrent /recognize/ uploads share batched forward passes on it, after the quality gate
+executor = InferenceExecutor(
+    config.EXECUTOR_KIND, config.EXECUTOR_WORKERS, config.EXECUTOR_MAX_PENDING, initializer=warm_up_worker
+)
+batcher = MicroBatcher(
+    represent_gated, executor, config.BATCH_MAX_SIZE, config.BATCH_MAX_WAIT_MS, config.BATCH_MAX_QUEUE
+)
+
+
+# Double-tapped kiosk captures are answered from here instead of re-running the model;
+# single- and multi-face results are cached separately
+result_cache = ResultCache(
+    config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL_SECONDS, config.RESULT_CACHE_NEAR_DISTANCE
+)
+faces_cache = ResultCache(
+    config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL_SECONDS, config.RESULT_CACHE_NEAR_DISTANCE
+)
+
+# Request latency histograms, gallery/model gauges and /metrics
+instrument(app, gallery_size=lambda: len(gallery), model_ready=lambda: executor.ready)
+
+
+@app.on_event("startup")
+async def start_inference():
+    loop = asyncio.get_running_loop()
+    loop.create_task(executor.warm_up())
+    loop.create_task(refresh_gallery())
+    batcher.start()
+
+
+async def refresh_gallery():
+    """Picks up users registered through other worker processes sharing the store."""
+    while True:
+        await asyncio.sleep(config.GALLERY_REFRESH_SECONDS)
+        with stage("gallery_refresh"):
+            await run_in_threadpool(gallery.refresh)
+        await run_in_threadpool(train_index)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await batcher.stop()
+    executor.shutdown()
+    if gallery.index is not None:
+        gallery.index.save(config.ANN_INDEX_PATH)
+
  
 # Helper Functions
-def save_face_embedding(photo_path: str, embedding_file: str):
-    """Extracts and saves face embedding."""
+def user_folder_for(name: str) -> str:
+    """Returns the user's folder under BASE_FOLDER, or a 400 for names that would escape it."""
     try:
-        embedding = DeepFace.represent(img_path=photo_path, enforce_detection=False)
-        with open(embedding_file, "w") as f:
-            json.dump(embedding, f, indent=4)
-        return embedding
+        return user_folder(BASE_FOLDER, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def save_face_embedding(images: list, user: str, details: dict):
+    """Embeds every enrollment sample and saves them to the gallery and embedding store."""
+    try:
+        representations = await executor.run(represent_batch, images)
+        embeddings = [faces[0]["embedding"] for faces in representations if faces]
+        if not embeddings:
+            raise HTTPException(status_code=400, detail="No face found in the uploaded images.")
+        await run_in_threadpool(gallery.add, user, embeddings, details)
+        await run_in_threadpool(train_index)
+        return representations
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving embedding: {str(e)}")
  
  
-@app.post("/register/")
-async def register_user(
-    name: str = Form(...), age: int = Form(...), gender: str = Form(...), photo: UploadFile = None
-):
-    """Registers a user by saving the uploaded photo and details."""
-    user_folder = os.path.join(BASE_FOLDER, name)
+def save_user_files(user_folder: str, user_details: dict, photos: list):
+    """Writes the user's details and uploaded photos (photo.jpg, photo_1.jpg, ...)."""
     os.makedirs(user_folder, exist_ok=True)
- 
-    # Save user details
     details_file = os.path.join(user_folder, "details.json")
-    user_details = {"name": name, "age": age, "gender": gender}
     with open(details_file, "w") as f:
         json.dump(user_details, f, indent=4)
+    for i, photo_bytes in enumerate(photos):
+        photo_path = os.path.join(user_folder, f"photo_{i}.jpg" if i else "photo.jpg")
+        with open(photo_path, "wb") as f:
+            f.write(photo_bytes)
  
-    # Save uploaded photo
-    photo_path = os.path.join(user_folder, "photo.jpg")
-    with open(photo_path, "wb") as f:
-        f.write(await photo.read())
  
-    # Save face embedding
-    embedding_file = os.path.join(user_folder, "embedding.json")
-    save_face_embedding(photo_path, embedding_file)
+async def decode_upload(photo_bytes: bytes):
+    """Decodes an upload in memory, without touching the filesystem."""
+    try:
+        return await executor.run(decode_image, photo_bytes, config.DECODE_MAX_SIDE)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
  
-    return {"message": "User registered successfully.", "details": user_details}
  
+async def decode_clip_upload(clip_bytes: bytes):
+    """Samples enrollment frames from an uploaded video clip."""
+    try:
+        return await executor.run(decode_clip, clip_bytes, config.ENROLL_MAX_SAMPLES, config.DECODE_MAX_SIDE)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
  
-@app.post("/recognize/")
-async def recognize_face(photo: UploadFile):
-    """Recognizes a face by comparing uploaded photo with saved embeddings."""
-    # Save uploaded photo temporarily
-    temp_photo_path = "temp_photo.jpg"
-    with open(temp_photo_path, "wb") as f:
-        f.write(await photo.read())
  
-    # Generate embedding for uploaded photo
-    try:
-        live_embedding = DeepFace.represent(img_path=temp_photo_path, enforce_detection=False)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating embedding: {str(e)}")
+@app.get("/ready")
+def readiness():
+    """Reports ready only once the recognition model has been warmed up."""
+    if not executor.ready:
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    return {"status": "ready"}
  
-    # Load existing embeddings
-    embeddings = load_embeddings()
-    for user, data in embeddings.items():
-        stored_embedding = data["embedding"][0]["embedding"]
-        similarity = 1 - cosine(live_embedding[0]["embedding"], stored_embedding)
-        if similarity > 0.6:  # Threshold
-            return {"message": "Face recognized.", "user": data["details"], "similarity": similarity}
  
-    return {"message": "No match found."}
+@app.post("/register/")
+async def register_user(
+    name: str = Form(...),
+    age: int = Form(...),
+    gender: str = Form(...),
+    photo: UploadFile = None,
+    photos: List[UploadFile] = File(None),
+    clip: UploadFile = None,
+):
+    """Registers a user from one or more photos and/or a short clip, plus their details."""
+    folder = user_folder_for(name)
+    user_details = {"name": name, "age": age, "gender": gender}
+    uploads = ([photo] if photo else []) + (photos or [])
+    photo_bytes = [await upload.read() for upload in uploads[:config.ENROLL_MAX_SAMPLES]]
+    images = [await decode_upload(data) for data in photo_bytes]
+    if clip is not None and len(images) < config.ENROLL_MAX_SAMPLES:
+        images += (await decode_clip_upload(await clip.read()))[:config.ENROLL_MAX_SAMPLES - len(images)]
+    if not images:
+        raise HTTPException(status_code=400, detail="Upload at least one photo or a video clip.")
+    await run_in_threadpool(save_user_files, folder, user_details, photo_bytes)
+ 
+    # Save one template per sample, plus their centroid
+    await save_face_embedding(images, name, user_details)
+ 
+    return {"message": "User registered successfully.", "details": user_details}
  
  
-def load_embeddings(base_folder=BASE_FOLDER):
-    """Loads stored embeddings from disk."""
-    embeddings = {}
-    for user_folder in os.listdir(base_folder):
-        embedding_file = os.path.join(base_folder, user_folder, "embedding.json")
-        details_file = os.path.join(base_folder, user_folder, "details.json")
-        if os.path.exists(embedding_file) and os.path.exists(details_file):
-            with open(embedding_file, "r") as ef, open(details_file, "r") as df:
-                embeddings[user_folder] = {
-                    "embedding": json.load(ef),
-                    "details": json.load(df),
-                }
-    return embeddings
+# Each bulk import starts its own pool of model-loading processes, so only one runs at a time
+bulk_import = asyncio.Lock()
+
+
+@app.post("/register/bulk")
+async def register_bulk(photos: UploadFile = File(...), details: UploadFile = File(...)):
+    """Enrolls everyone in a details CSV (name, photo, ...) from a zip of their photos.
+
+    Re-uploading the same zip after an interruption resumes where it stopped.
+    One import runs at a time per server process, on at most
+    BULK_SERVER_WORKERS worker processes; a second upload meanwhile gets a 409.
+    """
+    if bulk_import.locked():
+        raise HTTPException(status_code=409, detail="A bulk enrollment is already running.")
+    async with bulk_import:
+        archive = await photos.read()
+        try:
+            source = PhotoSource(archive)
+            manifest = read_manifest(io.StringIO((await details.read()).decode("utf-8-sig")), BASE_FOLDER)
+        except (zipfile.BadZipFile, UnicodeDecodeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        journal = os.path.join(config.EMBEDDING_STORE, f"bulk-{hashlib.sha256(archive).hexdigest()[:16]}.journal")
+        workers = min(config.BULK_WORKERS or os.cpu_count() or 1, config.BULK_SERVER_WORKERS)
+        report = await run_in_threadpool(
+            enroll, manifest, source, gallery.store, BASE_FOLDER, workers, config.BULK_COMMIT_EVERY, journal
+        )
+    await run_in_threadpool(gallery.refresh)
+    await run_in_threadpool(train_index)
+    return {"message": f"Enrolled {report['enrolled']} users.", **report}
  
  
+@app.delete("/unregister/{name}")
+async def unregister_user(name: str):
+    """Removes a registered user and their face data."""
+    folder = user_folder_for(name)
+    # Another worker may have registered the user since this one last refreshed
+    await run_in_threadpool(gallery.refresh)
+    if name not in gallery.positions:
+        raise HTTPException(status_code=404, detail="User not found.")
+    await run_in_threadpool(gallery.remove, name)
+    if os.path.isdir(folder):
+        await run_in_threadpool(shutil.rmtree, folder)
+    return {"message": "User unregistered successfully."}
+ 
+ 
+async def recognize_bytes(photo_bytes: bytes, cache: ResultCache, respond):
+    """Runs an image through the result cache, decoding and embedding; respond(faces) builds the result."""
+    # Identical resubmissions skip decoding and embedding entirely
+    with stage("cache"):
+        key, version = content_key(photo_bytes), gallery.version
+        cached = cache.get(key, version)
+    if cached is not None:
+        return cached
+
+    # Decode the upload straight from memory
+    with stage("decode"):
+        image = await decode_upload(photo_bytes)
+    with stage("cache"):
+        image_hash = dhash(image) if cache.near_duplicates else None
+        cached = cache.get_similar(image_hash, version)
+    if cached is not None:
+        return cached
+ 
+    # Embed every detected face; covers queueing, detection and the forward pass
+    try:
+        with stage("embed"):
+            faces = await batcher.submit(image)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating embedding: {str(e)}")
+
+    # Compare against the in-memory gallery
+    with stage("match"):
+        result = respond(faces)
+    cache.put(key, version, result, image_hash)
+    return result
+
+
+@app.post("/recognize/")
+async def recognize_face(photo: UploadFile):
+    """Recognizes a face by comparing uploaded photo with saved embeddings.
+
+    A face rejected by the quality gate gets {"message": ..., "reason": ...}
+    instead, e.g. reason "blurry", so the client can ask for a better shot.
+    """
+    def respond(faces):
+        usable = [face for face in faces if face["embedding"] is not None]
+        if faces and not usable:
+            return {"message": "Face quality too low.", "reason": faces[0]["quality"]}
+        match = best_match(usable[0]["embedding"], gallery) if usable else None
+        if match:
+            return {"message": "Face recognized.", "user": match.details, "similarity": match.similarity}
+        return {"message": "No match found."}
+
+    with stage("read"):
+        photo_bytes = await photo.read()
+    return await recognize_bytes(photo_bytes, result_cache, respond)
+
+
+def respond_with_faces(faces):
+    return {"faces": recognize_faces(faces, gallery, config.MAX_FACES)}
+
+
+@app.post("/recognize/faces")
+async def recognize_faces_in_photo(photo: UploadFile):
+    """Recognizes every face in the uploaded photo (up to FACE_MAX_FACES, largest first).
+
+    Returns {"faces": [{bbox, identity, score}, ...]}; identity is null for
+    faces that match nobody.
+    """
+    with stage("read"):
+        photo_bytes = await photo.read()
+    return await recognize_bytes(photo_bytes, faces_cache, respond_with_faces)
+
+
+@app.websocket("/ws/recognize")
+async def recognize_stream(websocket: WebSocket):
+    """Recognizes a continuous stream of JPEG frames sent as binary messages.
+
+    Only the newest frame is kept while one is being recognized, at most
+    FACE_STREAM_MAX_FPS frames a second are processed, and each result is
+    pushed back as {"frame", "dropped", "faces"} (see streaming.py).
+    """
+    await serve_stream(
+        websocket,
+        lambda frame: recognize_bytes(frame, faces_cache, respond_with_faces),
+        config.STREAM_MAX_FPS,
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import cv2
+from metrics import Counter
+
+
+CACHE_LOOKUPS = Counter(
+    "recognition_cache_lookups_total", "Recognition result cache lookups by outcome.", labelnames=("result",)
+)
+
+
+def content_key(data: bytes) -> str:
+    """Hash of the raw upload; identical resubmissions share a key."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def dhash(image, size=8) -> int:
+    """64-bit difference hash of a BGR image; near-identical frames differ in only a few bits."""
+    grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(grey, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+class ResultCache:
+    """Bounded LRU cache of recognition results with a time-to-live.
+
+    Entries are keyed by content_key() of the upload and tagged with the
+    gallery version they were computed against; a lookup with a newer
+    version drops everything, so registrations and removals are never
+    masked by a stale answer. With `max_distance` >= 0, get_similar() also
+    answers for frames whose dhash() is within that many bits of a cached
+    one, e.g. a kiosk capture re-taken a moment later.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=10.0, max_distance=-1):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.max_distance = max_distance
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def near_duplicates(self):
+        return self.max_distance >= 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        # A newer gallery invalidates everything; a request that started before the change gets no hits
+        if self.version is None or version > self.version:
+            self._entries.clear()
+            self.version = version
+        return version == self.version
+
+    def get(self, key, version):
+        """Returns the cached result for an upload, or None."""
+        with self._lock:
+            entry = self._entries.get(key) if self._check_version(version) else None
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        CACHE_LOOKUPS.labels(result="hit" if entry else "miss").inc()
+        return entry[2] if entry else None
+
+    def get_similar(self, image_hash, version):
+        """Returns the result of the closest near-duplicate frame, or None."""
+        if not self.near_duplicates:
+            return None
+        best, best_distance = None, self.max_distance + 1
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries.items() if self._check_version(version) else ()
+            for key, (expires, cached_hash, result) in entries:
+                if cached_hash is None or expires < now:
+                    continue
+                distance = bin(cached_hash ^ image_hash).count("1")
+                if distance < best_distance:
+                    best, best_distance = key, distance
+            if best is not None:
+                self._entries.move_to_end(best)
+                result = self._entries[best][2]
+        CACHE_LOOKUPS.labels(result="near_hit" if best else "near_miss").inc()
+        return result if best else None
+
+    def put(self, key, version, result, image_hash=None):
+        with self._lock:
+            if not self._check_version(version):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, image_hash, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
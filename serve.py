@@ -0,0 +1,29 @@
+import argparse
+import os
+import uvicorn
+import config
+from embedding_store import open_store
+
+
+def main():
+    """Runs react_api with several worker processes sharing one embedding store.
+
+    Each worker warms up its own model, but all of them map the same
+    embedding matrix file and match against the mapping itself, so the
+    gallery is held once in the page cache.
+    Registrations append to the shared store and reach the other workers
+    on their next gallery refresh.
+    """
+    parser = argparse.ArgumentParser(description="Run the recognition server with multiple workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    # Migrate once here rather than racing in every worker
+    open_store(config.EMBEDDING_STORE, config.BASE_FOLDER)
+    uvicorn.run("react_api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
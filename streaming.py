@@ -0,0 +1,95 @@
+import asyncio
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from metrics import Counter
+
+
+STREAM_FRAMES = Counter(
+    "stream_frames_total", "Frames received on recognition streams, by outcome.", labelnames=("outcome",)
+)
+
+
+class LatestFrame:
+    """Single-slot mailbox holding only the newest frame of a stream.
+
+    put() replaces a frame that has not been taken yet (counting it as
+    dropped) instead of queueing behind it, so a slow consumer always works
+    on the most recent frame and never builds a backlog. get() returns
+    (sequence number, frame), or None once the stream is closed.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+        self._frame = None
+        self._ready = asyncio.Event()
+
+    def put(self, frame):
+        self.received += 1
+        if self._frame is not None:
+            self.dropped += 1
+            STREAM_FRAMES.labels(outcome="dropped").inc()
+        self._frame = (self.received, frame)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def get(self):
+        await self._ready.wait()
+        self._ready.clear()
+        frame, self._frame = self._frame, None
+        if frame is None and not self.closed:
+            return await self.get()
+        return frame
+
+
+async def serve_stream(websocket: WebSocket, recognize, max_fps=0.0):
+    """Runs recognize(frame_bytes) on the newest binary frame of a WebSocket, at most max_fps times a second.
+
+    Frames arriving while one is being recognized only replace the pending
+    one. Each result is sent back as JSON with the sequence number of the
+    frame it belongs to and the running count of dropped frames; an
+    HTTPException raised by recognize() is sent as {"error", "status"}
+    instead of closing the stream.
+    """
+    await websocket.accept()
+    slot = LatestFrame()
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    slot.put(message["bytes"])
+        finally:
+            slot.close()
+
+    loop = asyncio.get_running_loop()
+    receiver = loop.create_task(receive())
+    interval = 1 / max_fps if max_fps > 0 else 0.0
+    try:
+        while True:
+            taken = await slot.get()
+            if taken is None:
+                break
+            sequence, frame = taken
+            started = loop.time()
+            STREAM_FRAMES.labels(outcome="processed").inc()
+            try:
+                result = await recognize(frame)
+            except HTTPException as e:
+                result = {"error": e.detail, "status": e.status_code}
+            if slot.closed:
+                break
+            await websocket.send_json({"frame": sequence, "dropped": slot.dropped, **result})
+            delay = interval - (loop.time() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The apps are flat modules run from the repository root; make them importable from tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the servers' data folders out of the working tree; config reads these once, on first import
+_data = tempfile.mkdtemp(prefix="face-tests-")
+os.environ.setdefault("FACE_RECORDS_FOLDER", os.path.join(_data, "FaceRecords"))
+os.environ.setdefault("FACE_EMBEDDING_STORE", os.path.join(_data, "EmbeddingStore"))
@@ -0,0 +1,39 @@
+import io
+import os
+import pytest
+from benchmarks import stub_model
+
+stub_model.install(16)
+
+from bulk_enroll import PhotoSource, read_manifest
+
+
+def manifest_for(tmp_path, rows):
+    return read_manifest(io.StringIO("name,photo,age\n" + "".join(f"{row},30\n" for row in rows)), str(tmp_path))
+
+
+def test_manifest_skips_names_outside_the_records_folder(tmp_path):
+    manifest = manifest_for(tmp_path, ["alice,a.jpg", "../../x,b.jpg", "..,c.jpg", "a/b,d.jpg", "a\\b,e.jpg"])
+    assert list(manifest) == ["alice"]
+    assert manifest["alice"]["details"] == {"name": "alice", "age": 30}
+
+
+@pytest.mark.parametrize("photo", ["../../etc/passwd", "/etc/passwd", "\\\\server\\share.jpg", "C:/x.jpg", "a/../../b.jpg"])
+def test_manifest_skips_photos_outside_the_photo_folder(tmp_path, photo):
+    manifest = manifest_for(tmp_path, [f"bob,{photo}", "carol,people/carol.jpg"])
+    assert list(manifest) == ["carol"]
+    assert manifest["carol"]["photos"] == ["people/carol.jpg"]
+
+
+def test_photo_source_stays_inside_its_folder(tmp_path):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    (photos / "a.jpg").write_bytes(b"jpeg")
+    (tmp_path / "secret").write_bytes(b"secret")
+    os.symlink(tmp_path / "secret", photos / "link.jpg")
+
+    source = PhotoSource(str(photos))
+    assert source.read("a.jpg") == b"jpeg"
+    for name in ("../secret", "link.jpg"):
+        with pytest.raises(FileNotFoundError):
+            source.read(name)
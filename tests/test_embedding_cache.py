@@ -0,0 +1,130 @@
+import asyncio
+import numpy as np
+import pytest
+
+pytest.importorskip("tortoise")
+pytest.importorskip("aiosqlite")
+
+from tortoise import Tortoise
+from app.embedding_cache import EmbeddingCache, backfill_vectors, prepare_vector_search, sql_nearest, store_vector
+from app.models import Employee
+
+
+ENCODINGS = np.random.default_rng(21).normal(0, 0.1, size=(3, 128))
+GALLERY = np.random.default_rng(22).normal(0, 0.1, size=(40, 128))
+PROBES = np.random.default_rng(23).normal(0, 0.1, size=(10, 128))
+
+
+def run(coroutine):
+    async def with_database():
+        # The SQLite stand-in for Postgres + pgvector
+        await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models"]})
+        await Tortoise.generate_schemas()
+        try:
+            return await coroutine()
+        finally:
+            await Tortoise.close_connections()
+
+    return asyncio.run(with_database())
+
+
+async def create_employee(i):
+    return await Employee.create(
+        employee_id=f"E{i}",
+        name=f"Employee {i}",
+        email=f"e{i}@example.com",
+        department="Engineering",
+        face_embedding=ENCODINGS[i].tobytes(),
+        photo_url=f"/static/e{i}.jpg",
+    )
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_employees_enrolled_before_vector_search_are_backfilled(metric):
+    async def scenario():
+        existing = [await create_employee(i) for i in range(2)]
+        await prepare_vector_search(metric)
+        enrolled = await create_employee(2)
+        await store_vector(enrolled.pk, ENCODINGS[2].tobytes())
+
+        for employee, encoding in zip(existing + [enrolled], ENCODINGS):
+            probe = (encoding + 0.001).tobytes()
+            (pk, distance), = await sql_nearest(probe, metric=metric)
+            assert pk == employee.pk
+            assert distance < 0.05
+        # A second run finds nothing left to fill in
+        assert await backfill_vectors() == 0
+
+    run(scenario)
+
+
+def test_backfill_counts_rows_across_batches():
+    async def scenario():
+        for i in range(3):
+            await create_employee(i)
+        await prepare_vector_search()
+        await Tortoise.get_connection("default").execute_query("UPDATE employee SET face_vector = NULL")
+        assert await backfill_vectors(batch_size=2) == 3
+        nearest = await sql_nearest(ENCODINGS[1].tobytes(), k=3)
+        assert [pk for pk, _ in nearest][0] == (await Employee.get(employee_id="E1")).pk
+
+    run(scenario)
+
+
+def brute_force(probe, pks, encodings, metric, k):
+    if metric == "euclidean":
+        distances = np.sqrt(((encodings - probe) ** 2).sum(axis=1))
+    else:
+        distances = 1 - encodings @ probe / (np.linalg.norm(encodings, axis=1) * np.linalg.norm(probe))
+    order = np.argsort(distances)[:k]
+    return [pks[i] for i in order], distances[order]
+
+
+def assert_nearest(cache, pks, encodings, metric, k=5):
+    for probe in np.vstack([PROBES, encodings[:3] + 0.001]):
+        nearest = cache.nearest(probe.tobytes(), k=k, metric=metric)
+        expected_pks, expected_distances = brute_force(probe, pks, encodings, metric, k)
+        assert [pk for pk, _ in nearest] == expected_pks
+        np.testing.assert_allclose([distance for _, distance in nearest], expected_distances, rtol=1e-9)
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_cache_nearest_matches_brute_force_including_later_adds(metric):
+    async def scenario():
+        employees = [
+            await Employee.create(
+                employee_id=f"E{i}",
+                name=f"Employee {i}",
+                email=f"e{i}@example.com",
+                department="Engineering",
+                face_embedding=encoding.tobytes(),
+                photo_url=f"/static/e{i}.jpg",
+            )
+            for i, encoding in enumerate(GALLERY[:30])
+        ]
+        cache = EmbeddingCache()
+        assert await cache.ensure_loaded() is cache
+        pks = [employee.pk for employee in employees]
+        assert len(cache) == 30
+        assert_nearest(cache, pks, GALLERY[:30], metric)
+
+        # Enrolled after the load: visible without reloading, and a second ensure_loaded() keeps them
+        for offset, encoding in enumerate(GALLERY[30:]):
+            cache.add(1000 + offset, encoding.tobytes())
+        pks += [1000 + offset for offset in range(10)]
+        await cache.ensure_loaded()
+        assert len(cache) == 40
+        assert_nearest(cache, pks, GALLERY, metric)
+        (pk, distance), = cache.nearest((GALLERY[35] + 0.001).tobytes(), metric=metric)
+        assert pk == 1005
+
+        # Re-enrolling replaces the row in place; removing drops it
+        encodings = GALLERY.copy()
+        encodings[4] = PROBES[0]
+        cache.add(pks[4], PROBES[0].tobytes())
+        assert len(cache) == 40
+        assert_nearest(cache, pks, encodings, metric)
+        cache.remove(pks[7])
+        assert_nearest(cache, pks[:7] + pks[8:], np.delete(encodings, 7, axis=0), metric)
+
+    run(scenario)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from app.face_recognition import (
+    METRIC_THRESHOLDS,
+    best_match,
+    best_matches,
+    compare_faces,
+    face_distances,
+    threshold_for,
+)
+
+
+# Four known identities as fixed 128-d encodings, and one probe per identity a small step away
+IDENTITIES = np.random.default_rng(12).normal(0, 0.1, size=(4, 128))
+PROBES = IDENTITIES + np.random.default_rng(13).normal(0, 0.005, size=IDENTITIES.shape)
+STRANGER = np.random.default_rng(14).normal(0, 0.1, size=128)
+
+
+def brute_force_distances(probe, matrix, metric):
+    distances = []
+    for row in matrix:
+        if metric == "euclidean":
+            distances.append(np.sqrt(sum((a - b) ** 2 for a, b in zip(row, probe))))
+        else:
+            dot = sum(a * b for a, b in zip(row, probe))
+            norms = np.sqrt(sum(a * a for a in row)) * np.sqrt(sum(b * b for b in probe))
+            distances.append(1 - dot / norms)
+    return np.array(distances)
+
+
+def brute_force_top_k(probe, matrix, k, metric, threshold):
+    distances = brute_force_distances(probe, matrix, metric)
+    ranked = sorted(range(len(matrix)), key=lambda i: distances[i])[:k]
+    return [(i, distances[i]) for i in ranked if distances[i] <= threshold]
+
+
+def test_metric_thresholds():
+    assert METRIC_THRESHOLDS == {"euclidean": 0.6, "cosine": 0.07}
+    assert threshold_for("euclidean") == 0.6
+    assert threshold_for("cosine") == 0.07
+    assert threshold_for("cosine", 0.2) == 0.2
+    with pytest.raises(ValueError):
+        threshold_for("manhattan")
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_face_distances_match_brute_force(metric):
+    for probe in PROBES:
+        np.testing.assert_allclose(
+            face_distances(probe, IDENTITIES, metric), brute_force_distances(probe, IDENTITIES, metric), atol=1e-12
+        )
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_face_distances_accept_stored_bytes(metric):
+    stored = [row.tobytes() for row in IDENTITIES]
+    np.testing.assert_allclose(
+        face_distances(PROBES[0].tobytes(), stored, metric), face_distances(PROBES[0], IDENTITIES, metric)
+    )
+    assert compare_faces(PROBES[1].tobytes(), IDENTITIES[1].tobytes(), metric) == pytest.approx(
+        brute_force_distances(PROBES[1], IDENTITIES[1:2], metric)[0]
+    )
+
+
+def test_face_distances_empty_gallery():
+    assert face_distances(PROBES[0], np.empty((0, 128))).shape == (0,)
+    assert best_matches(PROBES[0], np.empty((0, 128))) == []
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+@pytest.mark.parametrize("k", [1, 2, 4, 10])
+def test_best_matches_match_brute_force(metric, k):
+    for probe in list(PROBES) + [STRANGER]:
+        for threshold in (None, np.inf):
+            limit = METRIC_THRESHOLDS[metric] if threshold is None else threshold
+            matches = best_matches(probe, IDENTITIES, k, metric, threshold)
+            expected = brute_force_top_k(probe, IDENTITIES, k, metric, limit)
+            assert [i for i, _ in matches] == [i for i, _ in expected]
+            np.testing.assert_allclose([d for _, d in matches], [d for _, d in expected], atol=1e-12)
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_best_match_finds_known_identities(metric):
+    for identity, probe in enumerate(PROBES):
+        index, distance = best_match(probe, IDENTITIES, metric)
+        assert index == identity
+        assert distance <= METRIC_THRESHOLDS[metric]
+    assert best_match(STRANGER, IDENTITIES, metric) is None
@@ -0,0 +1,203 @@
+import json
+import numpy as np
+import pytest
+from embedding_store import EmbeddingStore
+from gallery import EmbeddingGallery
+
+
+def vectors(count, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def test_remove_reaches_workers_that_have_not_refreshed(tmp_path):
+    first = EmbeddingGallery(store=EmbeddingStore(str(tmp_path))).load()
+    second = EmbeddingGallery(store=EmbeddingStore(str(tmp_path))).load()
+    first.add("alice", vectors(1)[0], {"name": "alice"})
+
+    # The second worker has not seen alice yet, but its delete must still reach the store
+    second.remove("alice")
+    assert "alice" not in second.positions
+    first.refresh()
+    assert "alice" not in first.positions
+    assert len(first) == 0
+
+
+def test_store_matrix_stays_a_view_with_templates_and_superseded_rows(tmp_path):
+    gallery = EmbeddingGallery(store=EmbeddingStore(str(tmp_path))).load()
+    samples = vectors(9, seed=1)
+    gallery.add("alice", samples[:3], {"name": "alice"})
+    gallery.add("bob", samples[3], {"name": "bob"})
+    gallery.add("carol", samples[4:7], {"name": "carol"})
+    gallery.add("alice", samples[7], {"name": "alice again"})
+    gallery.remove("bob")
+
+    matrix, user_ids, details = gallery.snapshot()
+    # Templates live in their own file, so the matrix holds only gallery rows and is never copied
+    assert isinstance(matrix.base, np.memmap) or isinstance(matrix, np.memmap)
+    assert list(user_ids) == [None, None, "carol", "alice"]
+    assert list(gallery.dead_rows) == [0, 1]
+    assert len(gallery) == 2
+    assert gallery.details_for("alice") == {"name": "alice again"}
+    np.testing.assert_allclose(
+        gallery.templates_for("carol"), samples[4:7] / np.linalg.norm(samples[4:7], axis=1, keepdims=True), rtol=1e-6
+    )
+
+
+@pytest.mark.parametrize("quantize", [None, "int8"])
+def test_matching_skips_dead_rows(tmp_path, quantize):
+    from matcher import match_embeddings
+
+    gallery = EmbeddingGallery(store=EmbeddingStore(str(tmp_path)), quantize=quantize).load()
+    samples = vectors(3, seed=2)
+    gallery.add("alice", samples[0], {"name": "alice"})
+    gallery.add("bob", samples[1], {"name": "bob"})
+    gallery.add("alice", samples[2], {"name": "alice"})
+    gallery.remove("bob")
+
+    # The probes are exactly the dead rows: neither may come back as a match
+    for probe in samples[:2]:
+        assert all(match.user == "alice" for match in match_embeddings(probe, gallery, top_k=3, threshold=2.0))
+    assert match_embeddings(samples[2], gallery, top_k=3)[0].user == "alice"
+
+
+def test_stores_with_templates_in_the_matrix_file_still_load(tmp_path):
+    samples = vectors(4, seed=3)
+    store = EmbeddingStore(str(tmp_path))
+    # Header of a store written before templates had their own file
+    with open(store.index_path, "w") as f:
+        f.write(json.dumps({"dim": samples.shape[1]}) + "\n")
+    store.append_many(["alice", "bob"], samples[[0, 3]], [{}, {}], templates=[samples[:3], None])
+
+    gallery = EmbeddingGallery(store=EmbeddingStore(str(tmp_path))).load()
+    assert list(gallery.user_ids) == [None, None, None, "alice", "bob"]
+    assert gallery.positions == {"alice": 3, "bob": 4}
+    np.testing.assert_allclose(
+        gallery.templates_for("alice"), samples[:3] / np.linalg.norm(samples[:3], axis=1, keepdims=True), rtol=1e-6
+    )
+
+
+def test_incremental_refresh_matches_a_full_reload(tmp_path):
+    from ann_index import IVFIndex
+
+    samples = vectors(40, seed=4)
+    writer = EmbeddingGallery(store=EmbeddingStore(str(tmp_path))).load()
+    for i in range(20):
+        writer.add(f"user{i}", samples[i], {"i": i})
+    reader = EmbeddingGallery(store=EmbeddingStore(str(tmp_path))).load()
+    reader.attach_index(IVFIndex(nlist=4, nprobe=4).train(samples))
+
+    writer.add("user3", samples[20:23], {"i": "3 again"})
+    writer.remove("user5")
+    for i in range(23, 40):
+        writer.add(f"user{i}", samples[i], {"i": i})
+    matrix_before = reader.matrix
+    reader.refresh()
+
+    reloaded = EmbeddingGallery(store=EmbeddingStore(str(tmp_path))).load()
+    assert reader.positions == reloaded.positions
+    assert list(reader.user_ids) == list(reloaded.user_ids)
+    assert list(reader.details) == list(reloaded.details)
+    assert list(reader.dead_rows) == list(reloaded.dead_rows)
+    assert set(reader.templates) == set(reloaded.templates) == {"user3"}
+    np.testing.assert_array_equal(reader.matrix, reloaded.matrix)
+    # Rows already seen are untouched by the refresh
+    np.testing.assert_array_equal(reader.matrix[:len(matrix_before)], matrix_before)
+    assert len(reader.index) == len(reader) == 36
+    ids, _ = reader.index.search(samples[5], k=36)
+    assert "user5" not in ids[0]
+
+
+@pytest.mark.parametrize("kind", ["float16", "int8"])
+def test_codes_are_extended_with_the_existing_scale(tmp_path, kind):
+    from quantized import QuantizedCodes
+
+    samples = vectors(40, seed=5)
+    gallery = EmbeddingGallery(store=EmbeddingStore(str(tmp_path)), quantize=kind).load()
+    for i in range(16):
+        gallery.add(f"user{i}", samples[i], {})
+    fitted = gallery.codes
+    # Fitted on 1, 3, 7 and then 15 rows as the gallery doubled
+    assert fitted.fitted_rows == 15 and len(fitted) == 16
+    gallery.add("user16", samples[16], {})
+    gallery.add("user3", samples[17], {})
+
+    # New rows reuse the scale of the last fit; rows already encoded are left alone
+    codes = gallery.codes
+    assert codes.fitted_rows == 15 and len(codes) == len(gallery.matrix) == 18
+    assert len(fitted) == 16
+    expected = QuantizedCodes(fitted.codes, fitted.scale).extend(gallery.matrix[16:])
+    np.testing.assert_array_equal(codes.codes, expected.codes)
+    if kind == "int8":
+        np.testing.assert_array_equal(codes.scale, fitted.scale)
+
+    # Once the gallery has doubled since the last fit the codes are fitted afresh
+    for i in range(18, 40):
+        gallery.add(f"user{i}", samples[i], {})
+    assert gallery.codes.fitted_rows == 31
+    np.testing.assert_array_equal(
+        gallery.codes.codes[:gallery.codes.fitted_rows],
+        QuantizedCodes.encode(gallery.matrix[:gallery.codes.fitted_rows], kind).codes,
+    )
+
+
+def test_in_memory_codes_follow_adds_replacements_and_removals(tmp_path):
+    from quantized import QuantizedCodes
+
+    samples = vectors(6, seed=6)
+    gallery = EmbeddingGallery(base_folder=str(tmp_path), quantize="int8").load()
+    for i in range(4):
+        gallery.add(f"user{i}", samples[i], {})
+    gallery.add("user1", samples[4], {})
+    gallery.remove("user0")
+    gallery.add("user5", samples[5], {})
+
+    scale = gallery.codes.scale
+    assert list(gallery.user_ids) == ["user1", "user2", "user3", "user5"]
+    rebuilt = QuantizedCodes(np.empty((0, 16), dtype=np.int8), scale).extend(gallery.matrix)
+    np.testing.assert_array_equal(gallery.codes.codes, rebuilt.codes)
+
+
+@pytest.mark.parametrize("store", [True, False])
+def test_published_snapshots_are_never_modified(tmp_path, store):
+    samples = vectors(6, seed=7)
+    gallery = EmbeddingGallery(str(tmp_path / "records"), store=EmbeddingStore(str(tmp_path)) if store else None)
+    gallery.load()
+    for i in range(4):
+        gallery.add(f"user{i}", samples[i], {"i": i})
+    matrix, user_ids, details = gallery.snapshot()
+    kept = (np.array(matrix), list(user_ids), list(details))
+
+    gallery.add("user1", samples[4], {"i": "1 again"})
+    gallery.remove("user2")
+    gallery.add("user5", samples[5], {"i": 5})
+
+    np.testing.assert_array_equal(matrix, kept[0])
+    assert list(user_ids) == kept[1]
+    assert list(details) == kept[2]
+    matrix, user_ids, details = gallery.snapshot()
+    assert len(matrix) == len(user_ids) == len(details)
+
+
+def test_matching_while_a_worker_registers(tmp_path):
+    import threading
+    from matcher import match_embeddings
+
+    samples = vectors(400, seed=8)
+    gallery = EmbeddingGallery(store=EmbeddingStore(str(tmp_path))).load()
+    gallery.add("user0", samples[0], {})
+    errors = []
+
+    def register():
+        try:
+            for i in range(1, 400):
+                gallery.add(f"user{i % 150}", samples[i], {})
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    writer = threading.Thread(target=register)
+    writer.start()
+    while writer.is_alive():
+        for match in match_embeddings(samples[:8], gallery, top_k=5, threshold=2.0):
+            assert all(m.user is not None for m in match)
+    writer.join()
+    assert not errors
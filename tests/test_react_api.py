@@ -0,0 +1,45 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from benchmarks import stub_model
+
+stub_model.install(16)
+
+import react_api
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(monkeypatch):
+    removed = []
+    monkeypatch.setattr(react_api.shutil, "rmtree", removed.append)
+    react_api.gallery.load()
+    test_client = TestClient(react_api.app)
+    test_client.removed = removed
+    return test_client
+
+
+@pytest.mark.parametrize("name", ["%2E%2E", "..", "%2E", "a%5Cb", "a%2Fb"])
+def test_unregister_refuses_names_outside_the_records_folder(client, name):
+    response = client.delete(f"/unregister/{name}")
+    assert response.status_code in (400, 404)
+    assert client.removed == []
+
+
+def test_unregister_needs_a_registered_user(client):
+    # A stray folder is not a registered user
+    os.makedirs(os.path.join(react_api.BASE_FOLDER, "stray"), exist_ok=True)
+    assert client.delete("/unregister/stray").status_code == 404
+    assert client.removed == []
+
+
+def test_unregister_removes_the_user_and_their_folder(client):
+    react_api.gallery.add("alice", np.ones(16), {"name": "alice"})
+    os.makedirs(os.path.join(react_api.BASE_FOLDER, "alice"), exist_ok=True)
+    assert client.delete("/unregister/alice").status_code == 200
+    assert "alice" not in react_api.gallery.positions
+    assert client.removed == [os.path.join(react_api.BASE_FOLDER, "alice")]
@@ -0,0 +1,76 @@
+import asyncio
+import numpy as np
+import pytest
+
+pytest.importorskip("tortoise")
+pytest.importorskip("aiosqlite")
+
+from tortoise import Tortoise
+from app import services
+from app.embedding_cache import embedding_cache
+from app.models import Attendance, Employee
+
+
+ENCODINGS = np.random.default_rng(31).normal(0, 0.1, size=(3, 128))
+
+
+def run(coroutine):
+    async def with_database():
+        await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models"]})
+        await Tortoise.generate_schemas()
+        embedding_cache.loaded = False
+        try:
+            return await coroutine()
+        finally:
+            await Tortoise.close_connections()
+
+    return asyncio.run(with_database())
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    # Photos name the encoding they show, standing in for dlib
+    photos = {f"employee{i}.jpg": (encoding + 0.001).tobytes() for i, encoding in enumerate(ENCODINGS)}
+    photos["stranger.jpg"] = np.random.default_rng(32).normal(0, 0.1, size=128).tobytes()
+    monkeypatch.setattr(services, "generate_face_embedding", photos.__getitem__)
+    monkeypatch.setattr(services.config, "EMBEDDING_SEARCH", "cache")
+
+
+async def create_employees():
+    return [
+        await Employee.create(
+            employee_id=f"E{i}",
+            name=f"Employee {i}",
+            email=f"e{i}@example.com",
+            department="Engineering",
+            face_embedding=encoding.tobytes(),
+            photo_url=f"/static/e{i}.jpg",
+        )
+        for i, encoding in enumerate(ENCODINGS)
+    ]
+
+
+def test_capture_attendance_checks_the_matched_employee_in_and_out(captured):
+    async def scenario():
+        employees = await create_employees()
+        response = await services.capture_attendance("employee1.jpg")
+        assert response["message"] == "Check-in successful"
+        response = await services.capture_attendance("employee1.jpg", "check_out")
+        assert response["message"] == "Check-out successful"
+
+        attendance = await Attendance.get(employee=employees[1])
+        assert attendance.check_in is not None and attendance.check_out is not None
+        assert await Attendance.filter(employee_id__in=[employees[0].pk, employees[2].pk]).count() == 0
+
+    run(scenario)
+
+
+def test_capture_attendance_rejects_unknown_faces(captured):
+    async def scenario():
+        await create_employees()
+        with pytest.raises(services.HTTPException) as error:
+            await services.capture_attendance("stranger.jpg")
+        assert error.value.status_code == 400
+        assert await Attendance.all().count() == 0
+
+    run(scenario)
@@ -0,0 +1,277 @@
+import queue
+import threading
+import cv2
+import numpy as np
+from matcher import match_embeddings
+from opencv.detection import iou
+
+
+class CaptureThread(threading.Thread):
+    """Reads frames in the background and keeps only the most recent one.
+
+    `source` is a camera index or video path for cv2.VideoCapture, an object
+    with a cv2-style read(), or any iterable of frames (e.g. synthetic test
+    frames). With `realtime=False` every frame is handed out in order, which
+    makes file and synthetic runs deterministic.
+    """
+
+    def __init__(self, source=0, realtime=True):
+        super().__init__(daemon=True)
+        if isinstance(source, (int, str)):
+            source = cv2.VideoCapture(source)
+        self.source = source
+        self.realtime = realtime
+        self.finished = threading.Event()
+        self._frames = queue.Queue(maxsize=1 if realtime else 8)
+        self._stop = threading.Event()
+
+    def _read(self):
+        if hasattr(self.source, "read"):
+            while True:
+                ret, frame = self.source.read()
+                if not ret:
+                    return
+                yield frame
+        else:
+            yield from self.source
+
+    def run(self):
+        frame_id = 0
+        for frame in self._read():
+            if self._stop.is_set():
+                break
+            if self.realtime:
+                # Drop the stale frame rather than falling behind the camera
+                try:
+                    self._frames.get_nowait()
+                except queue.Empty:
+                    pass
+                self._frames.put((frame_id, frame))
+            else:
+                while not self._stop.is_set():
+                    try:
+                        self._frames.put((frame_id, frame), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+            frame_id += 1
+        self.finished.set()
+
+    def frames(self):
+        """Yields (frame_id, frame) until the source is exhausted or stop() is called."""
+        while not self._stop.is_set():
+            try:
+                yield self._frames.get(timeout=0.1)
+            except queue.Empty:
+                if self.finished.is_set() and self._frames.empty():
+                    return
+
+    def stop(self):
+        self._stop.set()
+        if hasattr(self.source, "release"):
+            self.source.release()
+
+
+class Track:
+    """A face followed across frames, with its cached recognition result."""
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = tuple(int(v) for v in box)
+        self.misses = 0
+        self.match = None
+        self.confidence = 0.0
+        self.pending = False
+        self.recognitions = 0
+
+    @property
+    def label(self):
+        if self.match:
+            return f"{self.match.details.get('name', self.match.user)} ({self.match.similarity:.2f})"
+        return "Unknown" if self.recognitions else "..."
+
+
+class IoUTracker:
+    """Greedy IoU tracker assigning stable ids to detections across frames."""
+
+    def __init__(self, iou_threshold=0.3, max_misses=10):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = {}
+        self._next_id = 1
+
+    def update(self, boxes):
+        """Matches detections to tracks, returning the tracks created this frame."""
+        pairs = sorted(
+            ((iou(track.box, box), track_id, i) for track_id, track in self.tracks.items() for i, box in enumerate(boxes)),
+            reverse=True,
+        )
+        matched_tracks, matched_boxes = set(), set()
+        for overlap, track_id, i in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if track_id in matched_tracks or i in matched_boxes:
+                continue
+            self.tracks[track_id].box = tuple(int(v) for v in boxes[i])
+            self.tracks[track_id].misses = 0
+            matched_tracks.add(track_id)
+            matched_boxes.add(i)
+
+        for track_id in set(self.tracks) - matched_tracks:
+            self.tracks[track_id].misses += 1
+            if self.tracks[track_id].misses > self.max_misses:
+                del self.tracks[track_id]
+
+        created = []
+        for i, box in enumerate(boxes):
+            if i not in matched_boxes:
+                track = Track(self._next_id, box)
+                self.tracks[track.track_id] = track
+                created.append(track)
+                self._next_id += 1
+        return created
+
+
+def haar_detector(scale_factor=1.3, min_neighbors=5, min_size=0):
+    """Returns a cheap Haar cascade detector: BGR or greyscale frame -> list of (x, y, w, h)."""
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+    def detect(frame):
+        grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return [tuple(int(v) for v in box) for box in cascade.detectMultiScale(
+            grey, scaleFactor=scale_factor, minNeighbors=min_neighbors, minSize=(min_size, min_size)
+        )]
+
+    return detect
+
+
+def model_pool_embedder(crops):
+    """Embeds already-detected face crops with the warm model pool in one batched pass.
+
+    Crops failing the quality gate are not embedded and come back as None.
+    """
+    from model_pool import model_pool
+
+    representations = model_pool.represent_batch(crops, detector_backend="skip", check_quality=True)
+    return [faces[0]["embedding"] if faces else None for faces in representations]
+
+
+class StreamingRecognizer:
+    """Detect -> track -> recognize pipeline for video streams.
+
+    Detection runs every `detect_every` frames and the tracker carries boxes
+    in between. Embedding and matching run only for new tracks and for
+    tracks whose identity confidence has decayed below `min_confidence`;
+    everything else reuses the result cached on the track. All faces due
+    in a frame are embedded together and matched in one batch, at most
+    `max_faces` of them (largest first; 0 for no cap). With
+    `background=True` recognition runs on its own thread, so process() never
+    waits for the model and display keeps up with the camera.
+
+    `embedder` takes a list of face crops and returns one embedding per
+    crop, or None for a crop not worth embedding (e.g. blurry); that track
+    is simply retried on a later frame.
+    """
+
+    def __init__(
+        self,
+        gallery,
+        detector=None,
+        embedder=model_pool_embedder,
+        detect_every=1,
+        min_confidence=0.4,
+        decay=0.97,
+        unknown_confidence=0.6,
+        threshold=None,
+        max_faces=0,
+        background=True,
+    ):
+        self.gallery = gallery
+        self.detector = detector or haar_detector()
+        self.embedder = embedder
+        self.detect_every = detect_every
+        self.min_confidence = min_confidence
+        self.decay = decay
+        self.unknown_confidence = unknown_confidence
+        self.threshold = threshold
+        self.max_faces = max_faces
+        self.tracker = IoUTracker()
+        self.frames = 0
+        self.recognitions = 0
+        self._jobs = None
+        if background:
+            self._jobs = queue.Queue()
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def process(self, frame):
+        """Advances the pipeline by one frame and returns the live tracks."""
+        if self.frames % self.detect_every == 0:
+            self.tracker.update(self.detector(frame))
+        self.frames += 1
+
+        tracks = list(self.tracker.tracks.values())
+        due = []
+        for track in tracks:
+            if track.misses:
+                continue
+            track.confidence *= self.decay
+            if track.confidence < self.min_confidence and not track.pending:
+                due.append(track)
+        if self.max_faces > 0:
+            due = sorted(due, key=lambda track: -track.box[2] * track.box[3])[:self.max_faces]
+        if due:
+            jobs = []
+            for track in due:
+                track.pending = True
+                jobs.append((track, self._crop(frame, track.box)))
+            if self._jobs is not None:
+                self._jobs.put(jobs)
+            else:
+                self._recognize(jobs)
+        return tracks
+
+    def _crop(self, frame, box, margin=0.2):
+        x, y, w, h = box
+        dx, dy = int(w * margin), int(h * margin)
+        return np.ascontiguousarray(frame[max(0, y - dy):y + h + dy, max(0, x - dx):x + w + dx])
+
+    def _recognize(self, jobs):
+        try:
+            embeddings = self.embedder([crop for _, crop in jobs])
+            found = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+            probes = np.asarray([embeddings[i] for i in found], dtype=np.float32)
+            matches = match_embeddings(probes, self.gallery, threshold=self.threshold) if found else []
+            for i, match in zip(found, matches):
+                track = jobs[i][0]
+                track.match = match[0] if match else None
+                track.confidence = track.match.similarity if track.match else self.unknown_confidence
+                track.recognitions += 1
+                self.recognitions += 1
+        except Exception as e:
+            print(f"Error during recognition: {e}")
+        finally:
+            for track, _ in jobs:
+                track.pending = False
+
+    def _work(self):
+        while True:
+            jobs = self._jobs.get()
+            # Skip faces whose track ended while they were queued
+            live = []
+            for track, crop in jobs:
+                if track.track_id in self.tracker.tracks:
+                    live.append((track, crop))
+                else:
+                    track.pending = False
+            if live:
+                self._recognize(live)
+
+
+def draw_tracks(frame, tracks):
+    """Draws each track's box and cached label onto the frame."""
+    for track in tracks:
+        x, y, w, h = track.box
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.putText(frame, f"#{track.track_id} {track.label}", (x, max(15, y - 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    return frame
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+import cv2
+import numpy as np
+
+
+def read_jpegs(source, limit=0):
+    """Yields JPEG bytes for each frame of a video file or folder of images."""
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*")) if p.lower().endswith((".jpg", ".jpeg", ".png")))
+        for path in paths[:limit or None]:
+            with open(path, "rb") as f:
+                data = f.read()
+            if not path.lower().endswith(".png"):
+                yield data
+                continue
+            yield cv2.imencode(".jpg", cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR))[1].tobytes()
+        return
+    video = cv2.VideoCapture(source)
+    sent = 0
+    while not limit or sent < limit:
+        ret, frame = video.read()
+        if not ret:
+            break
+        yield cv2.imencode(".jpg", frame)[1].tobytes()
+        sent += 1
+    video.release()
+
+
+async def replay(url, frames, fps, linger):
+    """Sends frames at `fps` over one WebSocket and collects the pushed results.
+
+    Returns (results, send times by frame number). After the last frame the
+    connection stays open for `linger` seconds so the final results arrive.
+    """
+    import websockets
+
+    sent_at, results = {}, []
+    async with websockets.connect(url, max_size=None) as websocket:
+        async def receive():
+            async for message in websocket:
+                result = json.loads(message)
+                result["latency_ms"] = round((time.perf_counter() - sent_at[result["frame"]]) * 1000, 1)
+                results.append(result)
+                print(json.dumps(result))
+
+        receiver = asyncio.get_running_loop().create_task(receive())
+        interval = 1 / fps if fps > 0 else 0.0
+        started = time.perf_counter()
+        for i, frame in enumerate(frames, start=1):
+            # Pace by the recorded frame rate rather than by how fast the server answers
+            delay = started + (i - 1) * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent_at[i] = time.perf_counter()
+            await websocket.send(frame)
+        await asyncio.sleep(linger)
+        receiver.cancel()
+    return results, sent_at
+
+
+def main():
+    """Replays recorded frames against /ws/recognize and prints each result, then a summary."""
+    parser = argparse.ArgumentParser(description="Replay recorded frames against the streaming recognition endpoint.")
+    parser.add_argument("source", help="Video file or folder of frames")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws/recognize")
+    parser.add_argument("--fps", type=float, default=15.0, help="Rate frames are sent at (0: as fast as possible)")
+    parser.add_argument("--limit", type=int, default=0, help="Send at most this many frames")
+    parser.add_argument("--linger", type=float, default=2.0, help="Seconds to wait for results after the last frame")
+    args = parser.parse_args()
+
+    frames = list(read_jpegs(args.source, args.limit))
+    if not frames:
+        raise SystemExit(f"No frames could be read from {args.source}")
+    results, sent_at = asyncio.run(replay(args.url, frames, args.fps, args.linger))
+
+    latencies = [result["latency_ms"] for result in results]
+    print(json.dumps({
+        "sent": len(sent_at),
+        "results": len(results),
+        "dropped_by_server": results[-1]["dropped"] if results else 0,
+        "p50_latency_ms": round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+        "p95_latency_ms": round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+    }))
+
+
+if __name__ == "__main__":
+    main()